@@ -5,19 +5,215 @@ Samay v3 - Quality Assessment Module
 Phase 2: Advanced quality evaluation for prompt refinement
 """
 
+import hashlib
+import io
+import itertools
 import json
+import math
+import operator
+import os
+import pickle
 import sqlite3
 import re
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple, Iterable
+from dataclasses import dataclass, asdict, replace
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
 from pathlib import Path
+from types import MappingProxyType
 import uuid
 from enum import Enum
-import statistics
 
 from .local_llm import LocalLLMClient
 
+# orjson is an optional speedup for the feedback/suggestion JSON columns
+try:
+    import orjson
+
+    def _json_dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+
+_ASSESSMENT_SCORE_RE = re.compile(
+    r"(CLARITY|SPECIFICITY|COMPLETENESS|COHERENCE|EFFECTIVENESS|CREATIVITY):\s*([0-9]*\.?[0-9]+)",
+    re.IGNORECASE
+)
+
+_INSERT_ASSESSMENT_SQL = '''
+    INSERT INTO quality_assessments 
+    (assessment_id, session_id, version_id, clarity_score, specificity_score, completeness_score, 
+     coherence_score, effectiveness_score, creativity_score, overall_score, confidence_level, 
+     method_used, detailed_feedback, improvement_suggestions, benchmark_comparison, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_COMPARISON_SQL = '''
+    INSERT INTO comparative_assessments 
+    (comparison_id, session_id, version_ids, relative_scores, winner_version, comparison_notes, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SELECT_LATEST_ASSESSMENT_SQL = '''
+    SELECT assessment_id, clarity_score, specificity_score, completeness_score, 
+           coherence_score, effectiveness_score, creativity_score, overall_score, 
+           confidence_level, method_used, detailed_feedback, improvement_suggestions, 
+           benchmark_comparison, timestamp
+    FROM quality_assessments WHERE version_id = ? ORDER BY timestamp DESC LIMIT 1
+'''
+
+_SELECT_BENCHMARKS_SQL = 'SELECT benchmark_name, score_threshold FROM quality_benchmarks'
+
+_INSERT_PROMPT_FTS_SQL = 'INSERT INTO prompt_fts (version_id, prompt) VALUES (?, ?)'
+
+_SELECT_SIMILAR_VERSIONS_SQL = '''
+    SELECT version_id FROM prompt_fts WHERE prompt_fts MATCH ? ORDER BY rank LIMIT ?
+'''
+
+# Bump when QualityAssessment changes shape so stale pickles are ignored
+_ASSESSMENT_CACHE_VERSION = 1
+_ASSESSMENT_CACHE_TTL = 30 * 24 * 3600  # seconds
+_ASSESSMENT_CACHE_MAX_ROWS = 10000
+_ASSESSMENT_CACHE_SWEEP_EVERY = 256  # cache writes between expiry sweeps
+
+_SELECT_CACHED_ASSESSMENT_SQL = 'SELECT stored_at, payload FROM assessment_cache WHERE cache_key = ?'
+_INSERT_CACHED_ASSESSMENT_SQL = '''
+    INSERT OR REPLACE INTO assessment_cache (cache_key, stored_at, payload) VALUES (?, ?, ?)
+'''
+_DELETE_CACHED_ASSESSMENT_SQL = 'DELETE FROM assessment_cache WHERE cache_key = ?'
+_EXPIRE_CACHED_ASSESSMENTS_SQL = 'DELETE FROM assessment_cache WHERE stored_at < ?'
+_TRIM_CACHED_ASSESSMENTS_SQL = '''
+    DELETE FROM assessment_cache WHERE cache_key IN (
+        SELECT cache_key FROM assessment_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+    )
+'''
+
+# Feedback text per dimension for (< 0.5, < 0.7, >= 0.7) score buckets,
+# in QualityDimension order
+_FEEDBACK_TABLES = {
+    "clarity": (
+        "Consider using clearer language and better structure to improve understandability.",
+        "Good clarity, but could benefit from more explicit instructions.",
+        "Excellent clarity - the prompt is easy to understand."
+    ),
+    "specificity": (
+        "Add more specific details, examples, or constraints to guide the response.",
+        "Good level of detail, consider adding more specific examples.",
+        "Excellent specificity - clear and detailed instructions."
+    ),
+    "completeness": (
+        "The prompt seems incomplete. Consider adding context and requirements.",
+        "Fairly complete, but could benefit from additional context.",
+        "Comprehensive prompt with good context and requirements."
+    ),
+    "coherence": (
+        "Improve logical flow and structure for better coherence.",
+        "Good structure, but some parts could be better connected.",
+        "Excellent coherence - well-structured and logical."
+    ),
+    "effectiveness": (
+        "May not achieve intended goals. Clarify objectives and expected outcomes.",
+        "Likely to be effective, but could be more goal-oriented.",
+        "Highly effective prompt that should achieve its objectives."
+    ),
+    "creativity": (
+        "Consider adding creative elements or encouraging innovative thinking.",
+        "Some creative elements present, could encourage more innovation.",
+        "Excellent creativity - encourages innovative and original thinking."
+    )
+}
+
+# Improvement suggestion per dimension, in QualityDimension order
+_DIMENSION_SUGGESTIONS = (
+    "Use simpler language and break complex instructions into steps",
+    "Add specific examples and detailed requirements",
+    "Include more context and background information",
+    "Improve logical flow with connecting words and better structure",
+    "Clearly state the desired outcome and success criteria",
+    "Encourage creative thinking with open-ended questions"
+)
+
+# Added after the dimension suggestions when the overall score is low
+_GENERIC_SUGGESTIONS = (
+    "Consider the target audience and adjust language accordingly",
+    "Test the prompt with different scenarios to ensure robustness"
+)
+
+_MAX_SUGGESTIONS = 5
+
+# Suggestions for every combination of low-scoring dimensions, indexed by
+# bitmask and already capped at _MAX_SUGGESTIONS
+_SUGGESTIONS_BY_MASK = tuple(
+    tuple(text for bit, text in enumerate(_DIMENSION_SUGGESTIONS) if mask & (1 << bit))[:_MAX_SUGGESTIONS]
+    for mask in range(1 << len(_DIMENSION_SUGGESTIONS))
+)
+
+
+def _feedback_buckets(metrics: "QualityMetrics") -> Tuple[int, ...]:
+    """Feedback bucket index for each dimension score"""
+    return tuple(0 if score < 0.5 else 1 if score < 0.7 else 2 for score in metrics.scores)
+
+
+# Feedback dict and its JSON for all 3^6 bucket combinations, built at import
+# so no serialization happens per assessment. The dicts are shared - copy
+# before handing them out.
+_FEEDBACK_BY_BUCKETS = {
+    buckets: {
+        dimension: table[bucket]
+        for (dimension, table), bucket in zip(_FEEDBACK_TABLES.items(), buckets)
+    }
+    for buckets in itertools.product(range(3), repeat=len(_FEEDBACK_TABLES))
+}
+_FEEDBACK_JSON = {
+    buckets: _json_dumps(feedback) for buckets, feedback in _FEEDBACK_BY_BUCKETS.items()
+}
+
+
+def _flatten_benchmarks(standards: Dict[str, float]) -> Tuple[Tuple[str, float, float], ...]:
+    """(name, threshold, 1 / threshold) rows for benchmark comparison"""
+    # A zero threshold is met by every non-negative score, so its reciprocal is never used
+    return tuple(
+        (name, threshold, 1.0 / threshold if threshold else math.inf)
+        for name, threshold in standards.items()
+    )
+
+
+_DEFAULT_BENCHMARKS = MappingProxyType({
+    "high_quality_prompt": 0.8,
+    "professional_standard": 0.7,
+    "acceptable_quality": 0.6,
+    "needs_improvement": 0.5
+})
+_DEFAULT_BENCHMARK_THRESHOLDS = _flatten_benchmarks(_DEFAULT_BENCHMARKS)
+
+
+def _weighted_overall(scores: Iterable[float], weights: Tuple[float, ...]) -> float:
+    """Weighted sum of dimension scores, both in QualityDimension order"""
+    return sum(map(operator.mul, scores, weights))
+
+
+def _mean_and_stdev(values: Iterable[float]) -> Tuple[float, float]:
+    """Mean and sample standard deviation in a single (Welford) pass"""
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for value in values:
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+    
+    stdev = math.sqrt(m2 / (count - 1)) if count > 1 else 0
+    return mean, stdev
+
 
 class QualityDimension(Enum):
     CLARITY = "clarity"
@@ -47,6 +243,18 @@ class QualityMetrics:
     overall_score: float  # Weighted average
     confidence_level: float  # Assessment confidence
 
+    @property
+    def scores(self) -> Tuple[float, ...]:
+        """Dimension scores in QualityDimension order"""
+        return (
+            self.clarity_score,
+            self.specificity_score,
+            self.completeness_score,
+            self.coherence_score,
+            self.effectiveness_score,
+            self.creativity_score
+        )
+
 
 @dataclass
 class QualityAssessment:
@@ -61,9 +269,35 @@ class QualityAssessment:
     timestamp: str
 
 
+@dataclass
+class _PromptFeatures:
+    """Prompt derivatives shared by the heuristic assessors"""
+    text: str
+    lower: str
+    word_count: int
+    avg_sentence_length: float
+    paragraph_count: int
+    has_digit: bool
+
+    @classmethod
+    def from_prompt(cls, prompt: str) -> "_PromptFeatures":
+        sentences = prompt.split('.')
+        return cls(
+            text=prompt,
+            lower=prompt.lower(),
+            word_count=len(prompt.split()),
+            avg_sentence_length=sum(len(s.split()) for s in sentences) / len(sentences),
+            paragraph_count=len(prompt.split('\n\n')),
+            has_digit=re.search(r'\d', prompt) is not None
+        )
+
+
 class QualityAssessor:
     """Advanced quality assessment for prompt refinement"""
     
+    # Shared result for blank prompts; treated as read-only
+    _EMPTY_METRICS = QualityMetrics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+    
     def __init__(self, memory_dir: str = "memory", session_id: str = "default"):
         self.memory_dir = Path(memory_dir)
         self.memory_dir.mkdir(exist_ok=True)
@@ -80,19 +314,58 @@ class QualityAssessor:
             QualityDimension.EFFECTIVENESS: 0.15,
             QualityDimension.CREATIVITY: 0.05
         }
+        self._weight_vector = tuple(self.dimension_weights[dimension] for dimension in QualityDimension)
         
         # Assessment cache
         self.assessment_cache = {}
+        self._llm_prompt_cache = OrderedDict()  # prompt hash -> LLM metrics
+        self._llm_prompt_cache_size = 256
         self.benchmark_standards = {}
+        self._benchmark_thresholds = _DEFAULT_BENCHMARK_THRESHOLDS  # (name, threshold, 1 / threshold) rows
+        
+        # Long-lived, tuned connection shared by every read and write so
+        # sqlite3 can reuse its prepared statements across calls (all hot SQL
+        # lives in module constants, keeping the statement-cache keys stable)
+        self._conn = self._connect()
+        self._cursor = self._conn.cursor()
+        self._db_lock = threading.Lock()
+        
+        # Assessment, prompt-index and assessment_cache rows waiting for a batched insert
+        self._pending_assessments = []
+        self._pending_prompts = []
+        self._pending_cache_rows = []
+        # Latest stored assessment per version_id, dropped when a version is re-stored
+        self._stored_assessment_cache = OrderedDict()
+        self._stored_assessment_cache_size = 4096
+        self._defer_depth = 0
         
         self.init_database()
+        
+        # Persistent assessment cache (assessment_cache table) so warm starts
+        # skip repeat LLM scoring; expired and excess rows are swept periodically
+        self._cache_writes = 0
+        self._cache_sweep_due = False
+        self._sweep_assessment_cache()
+        
+        # Single background worker for fire-and-forget report generation
+        self._report_executor = ThreadPoolExecutor(max_workers=1)
+        
         self._load_benchmark_standards()
         print(f"📊 QualityAssessor initialized for session {session_id}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open the assessment database with WAL journaling"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        # Bound WAL growth under sustained assessment writes (pages between checkpoints)
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        return conn
+    
     def init_database(self):
         """Initialize quality assessment database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         # Quality assessments table
         cursor.execute('''
@@ -138,9 +411,10 @@ class QualityAssessor:
                 relative_scores TEXT,
                 winner_version TEXT,
                 comparison_notes TEXT,
-                timestamp TEXT
+                timestamp INTEGER
             )
         ''')
+        self._migrate_comparative_timestamps(cursor)
         
         # Assessment history table
         cursor.execute('''
@@ -154,8 +428,80 @@ class QualityAssessor:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Persistent assessment cache, keyed by version, method and prompt hash
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS assessment_cache (
+                cache_key TEXT PRIMARY KEY,
+                stored_at REAL,
+                payload BLOB
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_assessment_cache_stored
+            ON assessment_cache(stored_at)
+        ''')
+        
+        # Indexes for version lookups (latest first) and per-session analytics
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_qa_version_ts
+            ON quality_assessments(version_id, timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_qa_session_version
+            ON quality_assessments(session_id, version_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ca_session
+            ON comparative_assessments(session_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ah_version
+            ON assessment_history(version_id)
+        ''')
+        
+        # Full-text index over assessed prompts for similarity lookups
+        # (skipped when SQLite is built without FTS5)
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS prompt_fts
+                USING fts5(version_id UNINDEXED, prompt)
+            ''')
+            self._fts_enabled = True
+        except sqlite3.OperationalError:
+            self._fts_enabled = False
+        
+        self._conn.commit()
+        cursor.close()
+    
+    def _migrate_comparative_timestamps(self, cursor: sqlite3.Cursor):
+        """Convert legacy ISO-text comparison timestamps to epoch microseconds"""
+        
+        cursor.execute("PRAGMA table_info(comparative_assessments)")
+        column_types = {row[1]: row[2] for row in cursor.fetchall()}
+        if column_types.get("timestamp", "").upper() != "TEXT":
+            return
+        
+        # SQLite cannot change a column type in place, so rebuild the table
+        cursor.execute('''
+            CREATE TABLE comparative_assessments_migrated (
+                comparison_id TEXT PRIMARY KEY,
+                session_id TEXT,
+                version_ids TEXT,
+                relative_scores TEXT,
+                winner_version TEXT,
+                comparison_notes TEXT,
+                timestamp INTEGER
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO comparative_assessments_migrated
+            SELECT comparison_id, session_id, version_ids, relative_scores, winner_version,
+                   comparison_notes,
+                   CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000000) AS INTEGER)
+            FROM comparative_assessments
+        ''')
+        cursor.execute("DROP TABLE comparative_assessments")
+        cursor.execute("ALTER TABLE comparative_assessments_migrated RENAME TO comparative_assessments")
     
     def assess_prompt_quality(
         self, 
@@ -167,10 +513,10 @@ class QualityAssessor:
         """Perform comprehensive quality assessment"""
         
         # Check cache first
-        cache_key = f"{version_id}_{method.value}"
-        if cache_key in self.assessment_cache:
+        cached = self._get_cached_assessment(version_id, method, prompt)
+        if cached is not None:
             print(f"📋 Using cached assessment for {version_id[:8]}")
-            return self.assessment_cache[cache_key]
+            return cached
         
         print(f"🔍 Assessing quality using {method.value} method...")
         
@@ -205,11 +551,10 @@ class QualityAssessor:
             timestamp=datetime.now().isoformat()
         )
         
-        # Store assessment
-        self._store_assessment(assessment)
-        
-        # Cache result
-        self.assessment_cache[cache_key] = assessment
+        # Store and cache the assessment in one transaction
+        with self.deferred_writes():
+            self._store_assessment(assessment, prompt)
+            self._cache_assessment(prompt, assessment)
         
         print(f"✅ Quality assessment completed")
         print(f"📊 Overall score: {metrics.overall_score:.2f}")
@@ -223,10 +568,18 @@ class QualityAssessor:
         if len(version_ids) != len(prompts):
             raise ValueError("Version IDs and prompts lists must have same length")
         
+        # Overlap the LLM round-trips for versions that still need scoring
+        self._prefetch_llm_assessments([
+            prompt for version_id, prompt in zip(version_ids, prompts)
+            if self._get_cached_assessment(version_id, AssessmentMethod.HYBRID, prompt) is None
+        ])
+        
+        # One insert transaction for the whole comparison
         assessments = []
-        for version_id, prompt in zip(version_ids, prompts):
-            assessment = self.assess_prompt_quality(prompt, version_id, AssessmentMethod.HYBRID)
-            assessments.append(assessment)
+        with self.deferred_writes():
+            for version_id, prompt in zip(version_ids, prompts):
+                assessment = self.assess_prompt_quality(prompt, version_id, AssessmentMethod.HYBRID)
+                assessments.append(assessment)
         
         # Comparative analysis
         comparison_data = {
@@ -268,11 +621,12 @@ class QualityAssessor:
         # Dimension analysis
         for dimension in QualityDimension:
             scores = [getattr(a.metrics, f"{dimension.value}_score") for a in assessments]
+            average, std_dev = _mean_and_stdev(scores)
             comparison_data["dimension_analysis"][dimension.value] = {
-                "average": statistics.mean(scores),
+                "average": average,
                 "max": max(scores),
                 "min": min(scores),
-                "std_dev": statistics.stdev(scores) if len(scores) > 1 else 0,
+                "std_dev": std_dev,
                 "best_version": version_ids[scores.index(max(scores))]
             }
         
@@ -351,118 +705,176 @@ class QualityAssessor:
         if not assessment:
             return "No quality assessment found for this version."
         
-        report_lines = [
-            f"# Quality Assessment Report",
-            f"**Version ID**: {version_id}",
-            f"**Assessment Date**: {assessment.timestamp}",
-            f"**Method**: {assessment.method_used.value}",
-            "",
-            "## Overall Quality Score",
-            f"**{assessment.metrics.overall_score:.2f}/1.00** (Confidence: {assessment.metrics.confidence_level:.2f})",
-            "",
-            "## Dimension Breakdown",
-            ""
-        ]
+        metrics = assessment.metrics
+        buf = io.StringIO()
+        w = buf.write
+        
+        w("# Quality Assessment Report\n")
+        w(f"**Version ID**: {version_id}\n")
+        w(f"**Assessment Date**: {assessment.timestamp}\n")
+        w(f"**Method**: {assessment.method_used.value}\n")
+        w("\n")
+        w("## Overall Quality Score\n")
+        w(f"**{metrics.overall_score:.2f}/1.00** (Confidence: {metrics.confidence_level:.2f})\n")
+        w("\n")
+        w("## Dimension Breakdown\n")
+        w("\n")
         
         # Dimension scores
-        dimensions = [
-            ("Clarity", assessment.metrics.clarity_score),
-            ("Specificity", assessment.metrics.specificity_score),
-            ("Completeness", assessment.metrics.completeness_score),
-            ("Coherence", assessment.metrics.coherence_score),
-            ("Effectiveness", assessment.metrics.effectiveness_score),
-            ("Creativity", assessment.metrics.creativity_score)
-        ]
-        
-        for name, score in dimensions:
+        for dimension, score in zip(QualityDimension, metrics.scores):
             status = "🟢" if score >= 0.7 else "🟡" if score >= 0.5 else "🔴"
-            report_lines.append(f"- **{name}**: {score:.2f} {status}")
+            w(f"- **{dimension.value.title()}**: {score:.2f} {status}\n")
         
-        report_lines.extend([
-            "",
-            "## Detailed Feedback",
-            ""
-        ])
+        w("\n")
+        w("## Detailed Feedback\n")
+        w("\n")
         
         # Add detailed feedback
         for dimension, feedback in assessment.detailed_feedback.items():
-            report_lines.extend([
-                f"### {dimension.replace('_', ' ').title()}",
-                feedback,
-                ""
-            ])
+            w(f"### {dimension.replace('_', ' ').title()}\n")
+            w(f"{feedback}\n")
+            w("\n")
         
         # Improvement suggestions
         if assessment.improvement_suggestions:
-            report_lines.extend([
-                "## Improvement Suggestions",
-                ""
-            ])
+            w("## Improvement Suggestions\n")
+            w("\n")
             for i, suggestion in enumerate(assessment.improvement_suggestions, 1):
-                report_lines.append(f"{i}. {suggestion}")
+                w(f"{i}. {suggestion}\n")
         
         # Benchmark comparison
         if assessment.benchmark_comparison:
-            report_lines.extend([
-                "",
-                "## Benchmark Comparison",
-                ""
-            ])
+            w("\n")
+            w("## Benchmark Comparison\n")
+            w("\n")
             for benchmark, score in assessment.benchmark_comparison.items():
                 status = "✅" if score >= 0.8 else "⚠️" if score >= 0.6 else "❌"
-                report_lines.append(f"- **{benchmark}**: {score:.2f} {status}")
+                w(f"- **{benchmark}**: {score:.2f} {status}\n")
         
-        return "\n".join(report_lines)
+        # Drop the final newline so the report matches the line-joined layout
+        return buf.getvalue()[:-1]
+    
+    @contextmanager
+    def deferred_writes(self):
+        """Buffer assessment inserts and write them in one transaction on exit"""
+        self._defer_depth += 1
+        try:
+            yield self
+        finally:
+            self._defer_depth -= 1
+            if not self._defer_depth:
+                self.flush_assessments()
+    
+    def store_assessments_batch(self, assessments: List[QualityAssessment]):
+        """Store several assessments with a single executemany and commit"""
+        with self.deferred_writes():
+            for assessment in assessments:
+                self._store_assessment(assessment)
+    
+    def flush_assessments(self):
+        """Write buffered assessment and cache rows in a single transaction"""
+        with self._db_lock:
+            if not self._pending_assessments and not self._pending_prompts and not self._pending_cache_rows:
+                return
+            rows, self._pending_assessments = self._pending_assessments, []
+            prompt_rows, self._pending_prompts = self._pending_prompts, []
+            cache_rows, self._pending_cache_rows = self._pending_cache_rows, []
+            sweep, self._cache_sweep_due = self._cache_sweep_due, False
+            with self._conn:
+                if rows:
+                    self._cursor.executemany(_INSERT_ASSESSMENT_SQL, rows)
+                if prompt_rows:
+                    self._cursor.executemany(_INSERT_PROMPT_FTS_SQL, prompt_rows)
+                if cache_rows:
+                    self._cursor.executemany(_INSERT_CACHED_ASSESSMENT_SQL, cache_rows)
+                if sweep:
+                    self._expire_cached_assessments()
+    
+    def generate_quality_report_async(self, version_id: str) -> Future:
+        """Generate a quality report on the background worker"""
+        return self._report_executor.submit(self.generate_quality_report, version_id)
     
     # Private assessment methods
     def _heuristic_assessment(self, prompt: str, context: Optional[Dict[str, Any]]) -> QualityMetrics:
         """Heuristic-based quality assessment"""
         
         if not prompt.strip():
-            return QualityMetrics(0, 0, 0, 0, 0, 0, 0, 1.0)
+            return self._EMPTY_METRICS
+        
+        return QualityMetrics(
+            *self._heuristic_scores(prompt),
+            confidence_level=0.8  # Heuristic confidence
+        )
+    
+    def _heuristic_scores(self, prompt: str) -> Tuple[float, ...]:
+        """Heuristic dimension scores in QualityDimension order, followed by the overall score"""
+        
+        if not prompt.strip():
+            return (0, 0, 0, 0, 0, 0, 0)
+        
+        # Lowercase, split and scan the prompt once for all heuristics
+        features = _PromptFeatures.from_prompt(prompt)
         
         # Clarity assessment
-        clarity_score = self._assess_clarity_heuristic(prompt)
+        clarity_score = self._assess_clarity_heuristic(features)
         
         # Specificity assessment
-        specificity_score = self._assess_specificity_heuristic(prompt)
+        specificity_score = self._assess_specificity_heuristic(features)
         
         # Completeness assessment
-        completeness_score = self._assess_completeness_heuristic(prompt)
+        completeness_score = self._assess_completeness_heuristic(features)
         
         # Coherence assessment
-        coherence_score = self._assess_coherence_heuristic(prompt)
+        coherence_score = self._assess_coherence_heuristic(features)
         
         # Effectiveness assessment
-        effectiveness_score = self._assess_effectiveness_heuristic(prompt)
+        effectiveness_score = self._assess_effectiveness_heuristic(features)
         
         # Creativity assessment
-        creativity_score = self._assess_creativity_heuristic(prompt)
+        creativity_score = self._assess_creativity_heuristic(features)
         
         # Calculate overall score
-        overall_score = (
-            clarity_score * self.dimension_weights[QualityDimension.CLARITY] +
-            specificity_score * self.dimension_weights[QualityDimension.SPECIFICITY] +
-            completeness_score * self.dimension_weights[QualityDimension.COMPLETENESS] +
-            coherence_score * self.dimension_weights[QualityDimension.COHERENCE] +
-            effectiveness_score * self.dimension_weights[QualityDimension.EFFECTIVENESS] +
-            creativity_score * self.dimension_weights[QualityDimension.CREATIVITY]
+        overall_score = _weighted_overall(
+            (clarity_score, specificity_score, completeness_score,
+             coherence_score, effectiveness_score, creativity_score),
+            self._weight_vector
         )
         
-        return QualityMetrics(
-            clarity_score=clarity_score,
-            specificity_score=specificity_score,
-            completeness_score=completeness_score,
-            coherence_score=coherence_score,
-            effectiveness_score=effectiveness_score,
-            creativity_score=creativity_score,
-            overall_score=overall_score,
-            confidence_level=0.8  # Heuristic confidence
+        return (
+            clarity_score,
+            specificity_score,
+            completeness_score,
+            coherence_score,
+            effectiveness_score,
+            creativity_score,
+            overall_score
         )
     
     def _llm_based_assessment(self, prompt: str, context: Optional[Dict[str, Any]]) -> QualityMetrics:
         """LLM-based quality assessment"""
         
+        if not prompt.strip():
+            return self._EMPTY_METRICS
+        
+        # Reuse scores for prompts the LLM has already evaluated
+        prompt_key = self._prompt_hash(prompt)
+        cached_metrics = self._llm_prompt_cache.get(prompt_key)
+        if cached_metrics is not None:
+            self._llm_prompt_cache.move_to_end(prompt_key)
+            return cached_metrics
+        
+        metrics = self._request_llm_metrics(prompt)
+        
+        if metrics is None:
+            # Fallback to heuristic if LLM fails
+            return self._heuristic_assessment(prompt, context)
+        
+        self._cache_llm_metrics(prompt_key, metrics)
+        return metrics
+    
+    def _request_llm_metrics(self, prompt: str) -> Optional[QualityMetrics]:
+        """Score a prompt with the local LLM, returning None if the call fails"""
+        
         assessment_prompt = f"""
         Evaluate this prompt across multiple quality dimensions. Provide scores from 0.0 to 1.0 for each dimension.
         
@@ -493,16 +905,15 @@ class QualityAssessor:
         response = self.llm_client.generate_response(assessment_prompt, system_prompt)
         
         if not response.success:
-            # Fallback to heuristic if LLM fails
-            return self._heuristic_assessment(prompt, context)
+            return None
         
         # Parse LLM response
         scores = self._parse_llm_assessment(response.response)
         
         # Calculate overall score
-        overall_score = sum(
-            scores[dim.value] * self.dimension_weights[dim] 
-            for dim in QualityDimension
+        overall_score = _weighted_overall(
+            (scores[dim.value] for dim in QualityDimension),
+            self._weight_vector
         )
         
         return QualityMetrics(
@@ -516,25 +927,61 @@ class QualityAssessor:
             confidence_level=0.9  # High confidence for LLM assessment
         )
     
+    def _cache_llm_metrics(self, prompt_key: str, metrics: QualityMetrics):
+        """Remember LLM metrics for a prompt, evicting the least recently used"""
+        self._llm_prompt_cache[prompt_key] = metrics
+        self._llm_prompt_cache.move_to_end(prompt_key)
+        if len(self._llm_prompt_cache) > self._llm_prompt_cache_size:
+            self._llm_prompt_cache.popitem(last=False)
+    
+    def _prefetch_llm_assessments(self, prompts: List[str]):
+        """Issue LLM evaluations for several prompts concurrently"""
+        
+        pending = {}
+        for prompt in prompts:
+            prompt_key = self._prompt_hash(prompt)
+            if prompt_key in self._llm_prompt_cache or prompt_key in pending:
+                continue
+            # Trivial prompts never reach the LLM in hybrid assessment
+            if self._heuristic_scores(prompt)[-1] < 0.15:
+                continue
+            pending[prompt_key] = prompt
+        
+        if len(pending) < 2:
+            return
+        
+        # Only the HTTP round-trips run in worker threads; the cache is
+        # updated from this thread once they complete
+        with ThreadPoolExecutor(max_workers=min(16, len(pending))) as executor:
+            results = list(executor.map(self._request_llm_metrics, pending.values()))
+        
+        for prompt_key, metrics in zip(pending, results):
+            if metrics is not None:
+                self._cache_llm_metrics(prompt_key, metrics)
+    
     def _hybrid_assessment(self, prompt: str, context: Optional[Dict[str, Any]]) -> QualityMetrics:
         """Hybrid assessment combining heuristic and LLM methods"""
         
-        # Get both assessments
-        heuristic_metrics = self._heuristic_assessment(prompt, context)
+        # Heuristic scores stay a plain tuple; only the combined result is
+        # materialized as QualityMetrics
+        heuristic_scores = self._heuristic_scores(prompt)
+        
+        # Trivial prompts are not worth an LLM round-trip
+        if heuristic_scores[-1] < 0.15:
+            return QualityMetrics(*heuristic_scores, confidence_level=0.7)
+        
         llm_metrics = self._llm_based_assessment(prompt, context)
+        llm_scores = (*llm_metrics.scores, llm_metrics.overall_score)
         
         # Combine with weighted average (favor LLM for complex assessment)
         heuristic_weight = 0.3
         llm_weight = 0.7
         
         combined_metrics = QualityMetrics(
-            clarity_score=heuristic_metrics.clarity_score * heuristic_weight + llm_metrics.clarity_score * llm_weight,
-            specificity_score=heuristic_metrics.specificity_score * heuristic_weight + llm_metrics.specificity_score * llm_weight,
-            completeness_score=heuristic_metrics.completeness_score * heuristic_weight + llm_metrics.completeness_score * llm_weight,
-            coherence_score=heuristic_metrics.coherence_score * heuristic_weight + llm_metrics.coherence_score * llm_weight,
-            effectiveness_score=heuristic_metrics.effectiveness_score * heuristic_weight + llm_metrics.effectiveness_score * llm_weight,
-            creativity_score=heuristic_metrics.creativity_score * heuristic_weight + llm_metrics.creativity_score * llm_weight,
-            overall_score=heuristic_metrics.overall_score * heuristic_weight + llm_metrics.overall_score * llm_weight,
+            *(
+                heuristic_score * heuristic_weight + llm_score * llm_weight
+                for heuristic_score, llm_score in zip(heuristic_scores, llm_scores)
+            ),
             confidence_level=0.95  # High confidence for hybrid approach
         )
         
@@ -547,42 +994,41 @@ class QualityAssessor:
         base_metrics = self._hybrid_assessment(prompt, context)
         
         # Find similar versions for comparison
-        similar_assessments = self._find_similar_assessments(prompt)
+        similar_assessments = self._find_similar_assessments(prompt, exclude_version_id=version_id)
         
         if similar_assessments:
             # Adjust scores based on comparative performance
-            avg_similar_score = statistics.mean([a.metrics.overall_score for a in similar_assessments])
+            avg_similar_score, _ = _mean_and_stdev(a.metrics.overall_score for a in similar_assessments)
             
             # Boost confidence if significantly better than similar
             if base_metrics.overall_score > avg_similar_score + 0.1:
-                base_metrics.confidence_level = min(base_metrics.confidence_level + 0.05, 1.0)
+                base_metrics = replace(base_metrics, confidence_level=min(base_metrics.confidence_level + 0.05, 1.0))
             elif base_metrics.overall_score < avg_similar_score - 0.1:
-                base_metrics.confidence_level = max(base_metrics.confidence_level - 0.05, 0.0)
+                base_metrics = replace(base_metrics, confidence_level=max(base_metrics.confidence_level - 0.05, 0.0))
         
         return base_metrics
     
     # Heuristic assessment methods
-    def _assess_clarity_heuristic(self, prompt: str) -> float:
+    def _assess_clarity_heuristic(self, features: _PromptFeatures) -> float:
         """Assess clarity using heuristics"""
         score = 0.5  # Base score
         
         # Clear structure indicators
-        if any(marker in prompt for marker in [':', '-', '1.', '2.', '•']):
+        if any(marker in features.text for marker in [':', '-', '1.', '2.', '•']):
             score += 0.1
         
         # Question clarity
-        question_count = prompt.count('?')
+        question_count = features.text.count('?')
         if 1 <= question_count <= 3:
             score += 0.1
         
         # Avoid ambiguous words
         ambiguous_words = ['maybe', 'perhaps', 'possibly', 'might', 'could be']
-        ambiguous_count = sum(1 for word in ambiguous_words if word in prompt.lower())
+        ambiguous_count = sum(1 for word in ambiguous_words if word in features.lower)
         score -= ambiguous_count * 0.05
         
         # Sentence length (shorter is clearer)
-        sentences = prompt.split('.')
-        avg_length = sum(len(s.split()) for s in sentences) / len(sentences) if sentences else 0
+        avg_length = features.avg_sentence_length
         if avg_length <= 15:
             score += 0.1
         elif avg_length > 25:
@@ -590,36 +1036,36 @@ class QualityAssessor:
         
         return max(0, min(1, score))
     
-    def _assess_specificity_heuristic(self, prompt: str) -> float:
+    def _assess_specificity_heuristic(self, features: _PromptFeatures) -> float:
         """Assess specificity using heuristics"""
         score = 0.5  # Base score
         
         # Specific instruction words
         specific_words = ['specific', 'exactly', 'precisely', 'detailed', 'example', 'format']
-        specific_count = sum(1 for word in specific_words if word in prompt.lower())
+        specific_count = sum(1 for word in specific_words if word in features.lower)
         score += min(specific_count * 0.05, 0.2)
         
         # Numbers and measurements
-        if re.search(r'\d+', prompt):
+        if features.has_digit:
             score += 0.1
         
         # Concrete examples
-        if 'example' in prompt.lower() or 'for instance' in prompt.lower():
+        if 'example' in features.lower or 'for instance' in features.lower:
             score += 0.1
         
         # Vague language penalty
         vague_words = ['something', 'anything', 'some', 'general', 'basic']
-        vague_count = sum(1 for word in vague_words if word in prompt.lower())
+        vague_count = sum(1 for word in vague_words if word in features.lower)
         score -= vague_count * 0.05
         
         return max(0, min(1, score))
     
-    def _assess_completeness_heuristic(self, prompt: str) -> float:
+    def _assess_completeness_heuristic(self, features: _PromptFeatures) -> float:
         """Assess completeness using heuristics"""
         score = 0.5  # Base score
         
         # Length as completeness indicator
-        word_count = len(prompt.split())
+        word_count = features.word_count
         if 50 <= word_count <= 200:
             score += 0.2
         elif 20 <= word_count <= 300:
@@ -629,35 +1075,34 @@ class QualityAssessor:
         
         # Context indicators
         context_words = ['context', 'background', 'purpose', 'goal', 'objective']
-        context_count = sum(1 for word in context_words if word in prompt.lower())
+        context_count = sum(1 for word in context_words if word in features.lower)
         score += min(context_count * 0.05, 0.15)
         
         # Requirements specification
         requirement_words = ['must', 'should', 'need', 'require', 'include']
-        req_count = sum(1 for word in requirement_words if word in prompt.lower())
+        req_count = sum(1 for word in requirement_words if word in features.lower)
         score += min(req_count * 0.03, 0.15)
         
         return max(0, min(1, score))
     
-    def _assess_coherence_heuristic(self, prompt: str) -> float:
+    def _assess_coherence_heuristic(self, features: _PromptFeatures) -> float:
         """Assess coherence using heuristics"""
         score = 0.5  # Base score
         
         # Logical connectors
         connectors = ['therefore', 'because', 'since', 'thus', 'consequently', 'first', 'second', 'finally']
-        connector_count = sum(1 for word in connectors if word in prompt.lower())
+        connector_count = sum(1 for word in connectors if word in features.lower)
         score += min(connector_count * 0.05, 0.2)
         
         # Paragraph structure (if multiple paragraphs)
-        paragraphs = prompt.split('\n\n')
-        if len(paragraphs) > 1:
+        if features.paragraph_count > 1:
             score += 0.1
         
         # Consistent tone/voice
         formal_words = ['please', 'kindly', 'would you']
         informal_words = ['hey', 'yo', 'gonna']
-        formal_count = sum(1 for word in formal_words if word in prompt.lower())
-        informal_count = sum(1 for word in informal_words if word in prompt.lower())
+        formal_count = sum(1 for word in formal_words if word in features.lower)
+        informal_count = sum(1 for word in informal_words if word in features.lower)
         
         # Penalty for mixed tone
         if formal_count > 0 and informal_count > 0:
@@ -665,56 +1110,128 @@ class QualityAssessor:
         
         return max(0, min(1, score))
     
-    def _assess_effectiveness_heuristic(self, prompt: str) -> float:
+    def _assess_effectiveness_heuristic(self, features: _PromptFeatures) -> float:
         """Assess effectiveness using heuristics"""
         score = 0.5  # Base score
         
         # Action-oriented language
         action_words = ['create', 'generate', 'write', 'analyze', 'explain', 'provide']
-        action_count = sum(1 for word in action_words if word in prompt.lower())
+        action_count = sum(1 for word in action_words if word in features.lower)
         score += min(action_count * 0.05, 0.2)
         
         # Goal clarity
-        if 'goal' in prompt.lower() or 'objective' in prompt.lower():
+        if 'goal' in features.lower or 'objective' in features.lower:
             score += 0.1
         
         # Output specification
         output_words = ['output', 'result', 'format', 'response']
-        output_count = sum(1 for word in output_words if word in prompt.lower())
+        output_count = sum(1 for word in output_words if word in features.lower)
         score += min(output_count * 0.05, 0.15)
         
         # Constraint specification
         constraint_words = ['limit', 'maximum', 'minimum', 'within', 'between']
-        constraint_count = sum(1 for word in constraint_words if word in prompt.lower())
+        constraint_count = sum(1 for word in constraint_words if word in features.lower)
         score += min(constraint_count * 0.03, 0.1)
         
         return max(0, min(1, score))
     
-    def _assess_creativity_heuristic(self, prompt: str) -> float:
+    def _assess_creativity_heuristic(self, features: _PromptFeatures) -> float:
         """Assess creativity using heuristics"""
         score = 0.5  # Base score
         
         # Creative language
         creative_words = ['creative', 'innovative', 'unique', 'original', 'imaginative', 'brainstorm']
-        creative_count = sum(1 for word in creative_words if word in prompt.lower())
+        creative_count = sum(1 for word in creative_words if word in features.lower)
         score += min(creative_count * 0.1, 0.3)
         
         # Open-ended questions
-        if '?' in prompt and ('how' in prompt.lower() or 'what if' in prompt.lower()):
+        if '?' in features.text and ('how' in features.lower or 'what if' in features.lower):
             score += 0.1
         
         # Multiple perspectives
         perspective_words = ['alternative', 'different', 'various', 'multiple', 'diverse']
-        perspective_count = sum(1 for word in perspective_words if word in prompt.lower())
+        perspective_count = sum(1 for word in perspective_words if word in features.lower)
         score += min(perspective_count * 0.05, 0.2)
         
         # Metaphors or analogies
-        if 'like' in prompt or 'as if' in prompt or 'imagine' in prompt.lower():
+        if 'like' in features.text or 'as if' in features.text or 'imagine' in features.lower:
             score += 0.05
         
         return max(0, min(1, score))
     
     # Helper methods
+    def _prompt_hash(self, prompt: str) -> str:
+        """Normalized hash of a prompt for LLM result reuse"""
+        return hashlib.blake2b(prompt.strip().lower().encode(), digest_size=16).hexdigest()
+    
+    def _persistent_cache_key(self, version_id: str, method: AssessmentMethod, prompt: str) -> str:
+        """assessment_cache key for an assessment"""
+        return f"v{_ASSESSMENT_CACHE_VERSION}:{version_id}:{method.value}:{self._prompt_hash(prompt)}"
+    
+    def _get_cached_assessment(
+        self, version_id: str, method: AssessmentMethod, prompt: str
+    ) -> Optional[QualityAssessment]:
+        """Look up an assessment in memory, then in the assessment_cache table"""
+        
+        cache_key = f"{version_id}_{method.value}"
+        assessment = self.assessment_cache.get(cache_key)
+        if assessment is not None:
+            return assessment
+        
+        persistent_key = self._persistent_cache_key(version_id, method, prompt)
+        with self._db_lock:
+            row = self._conn.execute(_SELECT_CACHED_ASSESSMENT_SQL, (persistent_key,)).fetchone()
+        if row is None:
+            return None
+        
+        stored_at, payload = row
+        assessment = None
+        if time.time() - stored_at <= _ASSESSMENT_CACHE_TTL:
+            try:
+                assessment = pickle.loads(payload)
+            except Exception:
+                pass  # Unreadable pickle - treat as a miss and drop it
+        
+        if assessment is None:
+            with self._db_lock:
+                with self._conn:
+                    self._conn.execute(_DELETE_CACHED_ASSESSMENT_SQL, (persistent_key,))
+            return None
+        
+        self.assessment_cache[cache_key] = assessment
+        return assessment
+    
+    def _cache_assessment(self, prompt: str, assessment: QualityAssessment):
+        """Cache an assessment in memory and in the assessment_cache table"""
+        
+        method = assessment.method_used
+        self.assessment_cache[f"{assessment.version_id}_{method.value}"] = assessment
+        
+        row = (
+            self._persistent_cache_key(assessment.version_id, method, prompt),
+            time.time(),
+            pickle.dumps(assessment, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        with self._db_lock:
+            self._pending_cache_rows.append(row)
+            self._cache_writes += 1
+            if self._cache_writes % _ASSESSMENT_CACHE_SWEEP_EVERY == 0:
+                self._cache_sweep_due = True
+        
+        if not self._defer_depth:
+            self.flush_assessments()
+    
+    def _sweep_assessment_cache(self):
+        """Drop expired cache rows and trim the table to the newest _ASSESSMENT_CACHE_MAX_ROWS"""
+        with self._db_lock:
+            with self._conn:
+                self._expire_cached_assessments()
+    
+    def _expire_cached_assessments(self):
+        """Run the assessment_cache expiry and trim (caller holds _db_lock inside a transaction)"""
+        self._conn.execute(_EXPIRE_CACHED_ASSESSMENTS_SQL, (time.time() - _ASSESSMENT_CACHE_TTL,))
+        self._conn.execute(_TRIM_CACHED_ASSESSMENTS_SQL, (_ASSESSMENT_CACHE_MAX_ROWS,))
+    
     def _parse_llm_assessment(self, response: str) -> Dict[str, float]:
         """Parse LLM assessment response"""
         
@@ -727,168 +1244,84 @@ class QualityAssessor:
             "creativity": 0.5
         }
         
-        # Extract scores using regex
-        for dimension in default_scores.keys():
-            pattern = f"{dimension.upper()}:\\s*([0-9.]+)"
-            match = re.search(pattern, response, re.IGNORECASE)
-            if match:
-                try:
-                    score = float(match.group(1))
-                    default_scores[dimension] = max(0, min(1, score))
-                except ValueError:
-                    pass
+        # Extract scores in a single pass; the first score per dimension wins
+        found = set()
+        for match in _ASSESSMENT_SCORE_RE.finditer(response):
+            dimension = match.group(1).lower()
+            if dimension in found:
+                continue
+            found.add(dimension)
+            default_scores[dimension] = max(0, min(1, float(match.group(2))))
         
         return default_scores
     
     def _generate_detailed_feedback(self, prompt: str, metrics: QualityMetrics) -> Dict[str, str]:
         """Generate detailed feedback for each dimension"""
-        
-        feedback = {}
-        
-        # Clarity feedback
-        if metrics.clarity_score < 0.5:
-            feedback["clarity"] = "Consider using clearer language and better structure to improve understandability."
-        elif metrics.clarity_score < 0.7:
-            feedback["clarity"] = "Good clarity, but could benefit from more explicit instructions."
-        else:
-            feedback["clarity"] = "Excellent clarity - the prompt is easy to understand."
-        
-        # Specificity feedback
-        if metrics.specificity_score < 0.5:
-            feedback["specificity"] = "Add more specific details, examples, or constraints to guide the response."
-        elif metrics.specificity_score < 0.7:
-            feedback["specificity"] = "Good level of detail, consider adding more specific examples."
-        else:
-            feedback["specificity"] = "Excellent specificity - clear and detailed instructions."
-        
-        # Completeness feedback
-        if metrics.completeness_score < 0.5:
-            feedback["completeness"] = "The prompt seems incomplete. Consider adding context and requirements."
-        elif metrics.completeness_score < 0.7:
-            feedback["completeness"] = "Fairly complete, but could benefit from additional context."
-        else:
-            feedback["completeness"] = "Comprehensive prompt with good context and requirements."
-        
-        # Coherence feedback
-        if metrics.coherence_score < 0.5:
-            feedback["coherence"] = "Improve logical flow and structure for better coherence."
-        elif metrics.coherence_score < 0.7:
-            feedback["coherence"] = "Good structure, but some parts could be better connected."
-        else:
-            feedback["coherence"] = "Excellent coherence - well-structured and logical."
-        
-        # Effectiveness feedback
-        if metrics.effectiveness_score < 0.5:
-            feedback["effectiveness"] = "May not achieve intended goals. Clarify objectives and expected outcomes."
-        elif metrics.effectiveness_score < 0.7:
-            feedback["effectiveness"] = "Likely to be effective, but could be more goal-oriented."
-        else:
-            feedback["effectiveness"] = "Highly effective prompt that should achieve its objectives."
-        
-        # Creativity feedback
-        if metrics.creativity_score < 0.5:
-            feedback["creativity"] = "Consider adding creative elements or encouraging innovative thinking."
-        elif metrics.creativity_score < 0.7:
-            feedback["creativity"] = "Some creative elements present, could encourage more innovation."
-        else:
-            feedback["creativity"] = "Excellent creativity - encourages innovative and original thinking."
-        
-        return feedback
+        return dict(_FEEDBACK_BY_BUCKETS[_feedback_buckets(metrics)])
     
     def _generate_improvement_suggestions(self, prompt: str, metrics: QualityMetrics) -> List[str]:
         """Generate specific improvement suggestions"""
         
-        suggestions = []
+        scores = metrics.scores
         
-        # Based on lowest scoring dimensions
-        scores = {
-            "clarity": metrics.clarity_score,
-            "specificity": metrics.specificity_score,
-            "completeness": metrics.completeness_score,
-            "coherence": metrics.coherence_score,
-            "effectiveness": metrics.effectiveness_score,
-            "creativity": metrics.creativity_score
-        }
-        
-        # Find areas for improvement (scores < 0.7)
-        improvements_needed = {k: v for k, v in scores.items() if v < 0.7}
-        
-        if "clarity" in improvements_needed:
-            suggestions.append("Use simpler language and break complex instructions into steps")
-        
-        if "specificity" in improvements_needed:
-            suggestions.append("Add specific examples and detailed requirements")
-        
-        if "completeness" in improvements_needed:
-            suggestions.append("Include more context and background information")
-        
-        if "coherence" in improvements_needed:
-            suggestions.append("Improve logical flow with connecting words and better structure")
+        # Common high-quality case: nothing to suggest
+        if metrics.overall_score >= 0.6 and min(scores) >= 0.7:
+            return []
         
-        if "effectiveness" in improvements_needed:
-            suggestions.append("Clearly state the desired outcome and success criteria")
+        # Bit i is set when dimension i (QualityDimension order) needs work (< 0.7)
+        mask = 0
+        for bit, score in enumerate(scores):
+            if score < 0.7:
+                mask |= 1 << bit
         
-        if "creativity" in improvements_needed:
-            suggestions.append("Encourage creative thinking with open-ended questions")
+        suggestions = list(_SUGGESTIONS_BY_MASK[mask])
         
-        # Generic suggestions if overall score is low
+        # Generic suggestions if overall score is low, stopping at the limit
         if metrics.overall_score < 0.6:
-            suggestions.append("Consider the target audience and adjust language accordingly")
-            suggestions.append("Test the prompt with different scenarios to ensure robustness")
+            for suggestion in _GENERIC_SUGGESTIONS:
+                if len(suggestions) >= _MAX_SUGGESTIONS:
+                    break
+                suggestions.append(suggestion)
         
-        return suggestions[:5]  # Limit to top 5 suggestions
+        return suggestions
     
     def _compare_against_benchmarks(self, metrics: QualityMetrics) -> Dict[str, float]:
         """Compare metrics against quality benchmarks"""
         
-        # Load or use default benchmarks
-        benchmarks = self.benchmark_standards or {
-            "high_quality_prompt": 0.8,
-            "professional_standard": 0.7,
-            "acceptable_quality": 0.6,
-            "needs_improvement": 0.5
+        benchmarks = self._benchmark_thresholds
+        overall_score = metrics.overall_score
+        return {
+            benchmark_name: 1.0 if overall_score >= threshold else overall_score * inverse
+            for benchmark_name, threshold, inverse in benchmarks
         }
-        
-        comparison = {}
-        for benchmark_name, threshold in benchmarks.items():
-            if metrics.overall_score >= threshold:
-                comparison[benchmark_name] = 1.0
-            else:
-                comparison[benchmark_name] = metrics.overall_score / threshold
-        
-        return comparison
     
     def _load_benchmark_standards(self):
         """Load quality benchmarks from database"""
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT benchmark_name, score_threshold FROM quality_benchmarks')
-        rows = cursor.fetchall()
-        conn.close()
+        with self._db_lock:
+            self._cursor.execute(_SELECT_BENCHMARKS_SQL)
+            rows = self._cursor.fetchall()
         
         if rows:
             self.benchmark_standards = {row[0]: row[1] for row in rows}
+            # Flattened once so each comparison is a single pass with no divides
+            self._benchmark_thresholds = _flatten_benchmarks(self.benchmark_standards)
         else:
             # Set default benchmarks
-            self.benchmark_standards = {
-                "high_quality_prompt": 0.8,
-                "professional_standard": 0.7,
-                "acceptable_quality": 0.6,
-                "needs_improvement": 0.5
-            }
+            self.benchmark_standards = _DEFAULT_BENCHMARKS
+            self._benchmark_thresholds = _DEFAULT_BENCHMARK_THRESHOLDS
     
-    def _store_assessment(self, assessment: QualityAssessment):
-        """Store assessment in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO quality_assessments 
-            (assessment_id, session_id, version_id, clarity_score, specificity_score, completeness_score, 
-             coherence_score, effectiveness_score, creativity_score, overall_score, confidence_level, 
-             method_used, detailed_feedback, improvement_suggestions, benchmark_comparison, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    def _store_assessment(self, assessment: QualityAssessment, prompt: Optional[str] = None):
+        """Store assessment in database, buffering while writes are deferred"""
+        
+        # Generated feedback is one of a fixed set of texts, so reuse its JSON
+        buckets = _feedback_buckets(assessment.metrics)
+        if assessment.detailed_feedback == _FEEDBACK_BY_BUCKETS[buckets]:
+            feedback_json = _FEEDBACK_JSON[buckets]
+        else:
+            feedback_json = _json_dumps(assessment.detailed_feedback)
+        
+        params = (
             assessment.assessment_id,
             self.session_id,
             assessment.version_id,
@@ -901,78 +1334,132 @@ class QualityAssessor:
             assessment.metrics.overall_score,
             assessment.metrics.confidence_level,
             assessment.method_used.value,
-            json.dumps(assessment.detailed_feedback),
-            json.dumps(assessment.improvement_suggestions),
-            json.dumps(assessment.benchmark_comparison),
+            feedback_json,
+            _json_dumps(assessment.improvement_suggestions),
+            _json_dumps(assessment.benchmark_comparison),
             assessment.timestamp
-        ))
-        conn.commit()
-        conn.close()
+        )
+        with self._db_lock:
+            self._pending_assessments.append(params)
+            if prompt and self._fts_enabled:
+                self._pending_prompts.append((assessment.version_id, prompt))
+            self._stored_assessment_cache.pop(assessment.version_id, None)
+        
+        if not self._defer_depth:
+            self.flush_assessments()
     
     def _get_stored_assessment(self, version_id: str) -> Optional[QualityAssessment]:
         """Retrieve stored assessment"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT assessment_id, clarity_score, specificity_score, completeness_score, 
-                   coherence_score, effectiveness_score, creativity_score, overall_score, 
-                   confidence_level, method_used, detailed_feedback, improvement_suggestions, 
-                   benchmark_comparison, timestamp
-            FROM quality_assessments WHERE version_id = ? ORDER BY timestamp DESC LIMIT 1
-        ''', (version_id,))
+        with self._db_lock:
+            cached = self._stored_assessment_cache.get(version_id)
+            if cached is not None:
+                self._stored_assessment_cache.move_to_end(version_id)
+                return cached
+        
+        # Make buffered rows visible to the lookup
+        self.flush_assessments()
         
-        row = cursor.fetchone()
-        conn.close()
+        with self._db_lock:
+            self._cursor.execute(_SELECT_LATEST_ASSESSMENT_SQL, (version_id,))
+            row = self._cursor.fetchone()
         
         if row:
-            metrics = QualityMetrics(
-                clarity_score=row[1],
-                specificity_score=row[2],
-                completeness_score=row[3],
-                coherence_score=row[4],
-                effectiveness_score=row[5],
-                creativity_score=row[6],
-                overall_score=row[7],
-                confidence_level=row[8]
-            )
+            (assessment_id, *metric_values, method_used,
+             detailed_feedback, improvement_suggestions, benchmark_comparison, timestamp) = row
             
-            return QualityAssessment(
-                assessment_id=row[0],
+            assessment = QualityAssessment(
+                assessment_id=assessment_id,
                 version_id=version_id,
-                metrics=metrics,
-                method_used=AssessmentMethod(row[9]),
-                detailed_feedback=json.loads(row[10]) if row[10] else {},
-                improvement_suggestions=json.loads(row[11]) if row[11] else [],
-                benchmark_comparison=json.loads(row[12]) if row[12] else {},
-                timestamp=row[13]
+                metrics=QualityMetrics(*metric_values),
+                method_used=AssessmentMethod(method_used),
+                detailed_feedback=_json_loads(detailed_feedback) if detailed_feedback else {},
+                improvement_suggestions=_json_loads(improvement_suggestions) if improvement_suggestions else [],
+                benchmark_comparison=_json_loads(benchmark_comparison) if benchmark_comparison else {},
+                timestamp=timestamp
             )
+            
+            with self._db_lock:
+                self._stored_assessment_cache[version_id] = assessment
+                if len(self._stored_assessment_cache) > self._stored_assessment_cache_size:
+                    self._stored_assessment_cache.popitem(last=False)
+            
+            return assessment
         
         return None
     
     def _store_comparative_assessment(self, version_ids: List[str], comparison_data: Dict[str, Any]):
         """Store comparative assessment"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO comparative_assessments 
-            (comparison_id, session_id, version_ids, relative_scores, winner_version, comparison_notes, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            str(uuid.uuid4()),
+        self.store_comparative_batch([(version_ids, comparison_data)])
+    
+    def store_comparative_batch(self, comparisons: List[Tuple[List[str], Dict[str, Any]]]):
+        """Store several (version_ids, comparison_data) results in one transaction"""
+        rows = [
+            self._comparison_row(version_ids, comparison_data)
+            for version_ids, comparison_data in comparisons
+        ]
+        with self._db_lock:
+            with self._conn:
+                self._cursor.executemany(_INSERT_COMPARISON_SQL, rows)
+    
+    def _comparison_row(self, version_ids: List[str], comparison_data: Dict[str, Any]) -> Tuple:
+        """Insert parameters for a comparative assessment"""
+        ranking = comparison_data["quality_ranking"]
+        return (
+            os.urandom(16).hex(),  # 128 random bits without the UUID object round-trip
             self.session_id,
             json.dumps(version_ids),
-            json.dumps(comparison_data["quality_ranking"]),
-            comparison_data["quality_ranking"][0]["version_id"] if comparison_data["quality_ranking"] else "",
+            json.dumps(ranking),
+            ranking[0]["version_id"] if ranking else "",
             json.dumps(comparison_data),
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-        conn.close()
-    
-    def _find_similar_assessments(self, prompt: str) -> List[QualityAssessment]:
-        """Find assessments for similar prompts"""
-        # Simplified - could use more sophisticated similarity matching
-        return []
+            time.time_ns() // 1000  # epoch microseconds
+        )
+    
+    def __enter__(self) -> "QualityAssessor":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the shared database connection"""
+        self._report_executor.shutdown(wait=True)
+        self.flush_assessments()
+        with self._db_lock:
+            # Fold the WAL back into the main database and truncate it
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._cursor.close()
+            self._conn.close()
+    
+    def _find_similar_assessments(
+        self, prompt: str, exclude_version_id: Optional[str] = None, limit: int = 10
+    ) -> List[QualityAssessment]:
+        """Find assessments for similar prompts via the FTS5 prompt index (BM25 ranked)"""
+        
+        if not self._fts_enabled:
+            return []
+        
+        # Any shared term matches; quoting keeps FTS5 query syntax out of the prompt
+        terms = list(dict.fromkeys(re.findall(r"\w+", prompt.lower())))[:32]
+        if not terms:
+            return []
+        query = " OR ".join(f'"{term}"' for term in terms)
+        
+        # Make buffered prompts visible to the search
+        self.flush_assessments()
+        
+        with self._db_lock:
+            self._cursor.execute(_SELECT_SIMILAR_VERSIONS_SQL, (query, limit))
+            version_ids = [row[0] for row in self._cursor.fetchall()]
+        
+        similar = []
+        for version_id in dict.fromkeys(version_ids):
+            if version_id == exclude_version_id:
+                continue
+            assessment = self._get_stored_assessment(version_id)
+            if assessment:
+                similar.append(assessment)
+        
+        return similar
 
 
 def main():
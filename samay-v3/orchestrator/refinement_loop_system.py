@@ -7,20 +7,328 @@ Phase 3: Automatic refinement loops to ensure correct outputs from web services
 
 import json
 import asyncio
+import hashlib
 import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple, Callable
+from typing import Dict, List, Optional, Any, Tuple, Callable, Iterator
 from dataclasses import dataclass, asdict
+from collections import Counter, OrderedDict, deque
 from pathlib import Path
 import uuid
 from enum import Enum
 import sqlite3
 import re
+import threading
+import queue
+import struct
+import weakref
+import zlib
+from contextlib import contextmanager
 
 from .local_llm import LocalLLMClient
 from .web_agent_dispatcher import ServiceType, OutputFormat, WebResponse, RequestStatus
 from .machine_language_optimizer import MachineLanguageOptimizer
 
+# orjson is an optional speedup for validating JSON responses
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# One-pass scanners for the response heuristics; each word is counted once however often it appears
+_UNCERTAINTY_RE = re.compile(r"maybe|perhaps|might|could be|not sure")
+_CONFIDENCE_RE = re.compile(r"is|are|will|must|definitely")
+_MARKDOWN_RE = re.compile(r"```|\*\*|[#*-]")
+
+# Characters a JSON document can start with (NaN/Infinity included, as json.loads accepts them)
+_JSON_START_CHARS = frozenset('{["-0123456789tfnNI')
+
+
+# Hot SQL kept as constants so the connection's statement cache reuses the prepared plans
+_INSERT_ATTEMPT_SQL = '''
+    INSERT INTO refinement_attempts 
+    (attempt_id, session_id, refinement_number, trigger_reason, service, attempt_success, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_PACKED_ATTEMPTS_SQL = '''
+    INSERT INTO refinement_attempts_packed (session_id, attempt_count, payload, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+
+_SELECT_SESSION_ATTEMPTS_SQL = '''
+    SELECT attempt_id, refinement_number, trigger_reason, refinement_prompt, expected_fix, 
+           service, response_received, attempt_success, timestamp
+    FROM refinement_attempts
+    WHERE session_id = ?
+    ORDER BY refinement_number
+'''
+
+_SELECT_PACKED_ATTEMPTS_SQL = '''
+    SELECT payload FROM refinement_attempts_packed WHERE session_id = ? ORDER BY pack_id
+'''
+
+_INSERT_PACK_DICT_SQL = '''
+    INSERT OR IGNORE INTO refinement_pack_dicts (dict_id, zdict) VALUES (?, ?)
+'''
+
+_SELECT_PACK_DICTS_SQL = '''
+    SELECT dict_id, zdict FROM refinement_pack_dicts
+'''
+
+_INSERT_METRIC_SQL = '''
+    INSERT INTO quality_metrics 
+    (metric_id, session_id, attempt_number, overall_quality, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_UPSERT_RULE_SQL = '''
+    INSERT OR REPLACE INTO refinement_rules 
+    (rule_id, trigger, condition_desc, action, priority, max_attempts, 
+     service_specific, success_rate, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_UPDATE_RULE_SUCCESS_SQL = '''
+    UPDATE refinement_rules SET success_rate = ? WHERE rule_id = ?
+'''
+
+_SELECT_RULES_SQL = '''
+    SELECT rule_id, trigger, condition_desc, action, priority, max_attempts, 
+           service_specific, success_rate
+    FROM refinement_rules
+'''
+
+_INSERT_SESSION_SQL = '''
+    INSERT INTO refinement_sessions 
+    (session_id, original_prompt, target_output, service, final_success, 
+     total_attempts, time_elapsed, final_quality_score, created_at, completed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_OVERALL_STATS_SQL = '''
+    SELECT 
+        COUNT(*) as total_sessions,
+        SUM(CASE WHEN final_success = 1 THEN 1 ELSE 0 END) as successful_sessions,
+        AVG(total_attempts) as avg_attempts,
+        AVG(time_elapsed) as avg_time,
+        AVG(final_quality_score) as avg_final_quality
+    FROM refinement_sessions
+'''
+
+_SERVICE_STATS_SQL = '''
+    SELECT 
+        service,
+        COUNT(*) as sessions,
+        AVG(total_attempts) as avg_attempts,
+        SUM(CASE WHEN final_success = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
+    FROM refinement_sessions
+    GROUP BY service
+'''
+
+_ATTEMPT_QUALITY_SQL = '''
+    SELECT 
+        COUNT(overall_quality) as scored_attempts,
+        AVG(overall_quality) as avg_quality,
+        MIN(overall_quality) as min_quality,
+        MAX(overall_quality) as max_quality
+    FROM quality_metrics
+'''
+
+_COMMON_ISSUES_SQL = '''
+    SELECT 
+        trigger_reason as issue,
+        COUNT(*) as frequency
+    FROM refinement_attempts
+    GROUP BY trigger_reason
+    ORDER BY frequency DESC
+    LIMIT 5
+'''
+
+
+def _completeness_score(length: int) -> float:
+    """Length-bucket completeness score"""
+    if length < 20:
+        return 0.1
+    elif length < 50:
+        return 0.4
+    elif length > 200:
+        return 1.0
+    return length / 200
+
+
+def _accuracy_score(uncertainty_count: int, confident_count: int) -> float:
+    """Accuracy score from distinct uncertain and confident indicator counts"""
+    if uncertainty_count > confident_count:
+        return 0.3
+    elif confident_count > 0:
+        return 0.8
+    return 0.5
+
+
+def _ratio_score(matches: int, total: int, empty: float) -> float:
+    """Fraction of matched items, or the given score when there is nothing to match"""
+    return matches / total if total else empty
+
+
+def _pack_attempts(attempts: List[Tuple[str, ...]], zdict: Optional[Tuple[bytes, bytes]] = None) -> bytes:
+    """Pack attempts' _PACKED_FIELDS into one blob, compressed with an optional (id, dictionary)"""
+    body = bytearray()
+    for *fields, response in attempts:
+        for field in fields:
+            data = field.encode("utf-8", "surrogatepass")
+            body += _PACKED_FIELD_LEN.pack(len(data))
+            body += data
+        
+        # Responses are bounded in UTF-8 bytes, only slicing the rare long ones
+        if len(response) > _RESPONSE_BYTES_LIMIT:
+            response = response[:_RESPONSE_BYTES_LIMIT]
+        data = memoryview(response.encode("utf-8", "surrogatepass"))
+        end = min(len(data), _RESPONSE_BYTES_LIMIT)
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1  # Back off to a character boundary
+        body += _PACKED_FIELD_LEN.pack(end)
+        body += data[:end]
+    
+    if zdict is None:
+        return bytes((_PACK_FORMAT_ZLIB,)) + zlib.compress(bytes(body))
+    zdict_id, zdict_data = zdict
+    compressor = zlib.compressobj(zdict=zdict_data)
+    return bytes((_PACK_FORMAT_ZDICT,)) + zdict_id + compressor.compress(bytes(body)) + compressor.flush()
+
+
+def _unpack_attempts(payload: bytes, zdicts: Dict[bytes, bytes]) -> List[Dict[str, str]]:
+    """Inverse of _pack_attempts, given the preset dictionaries by id"""
+    if payload[0] == _PACK_FORMAT_ZLIB:
+        body = zlib.decompress(payload[1:])
+    elif payload[0] == _PACK_FORMAT_ZDICT:
+        start = 1 + _PACK_ZDICT_ID_SIZE
+        decompressor = zlib.decompressobj(zdict=zdicts[payload[1:start]])
+        body = decompressor.decompress(payload[start:]) + decompressor.flush()
+    else:
+        raise ValueError(f"Unknown packed attempt format {payload[0]}")
+    
+    fields = []
+    offset = 0
+    while offset < len(body):
+        (length,) = _PACKED_FIELD_LEN.unpack_from(body, offset)
+        offset += _PACKED_FIELD_LEN.size
+        fields.append(body[offset:offset + length].decode("utf-8", "surrogatepass"))
+        offset += length
+    
+    width = len(_PACKED_FIELDS)
+    return [dict(zip(_PACKED_FIELDS, fields[i:i + width])) for i in range(0, len(fields), width)]
+
+
+def _settle_future(future: asyncio.Future, error: Optional[BaseException]):
+    """Resolve a write future on its own event loop unless it was cancelled"""
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    """Run the enclosed statements as one write transaction (caller holds the connection's lock)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def _run_write_jobs(conn: sqlite3.Connection, db_lock: threading.Lock, jobs):
+    """Execute the statements of the given write jobs in a single transaction"""
+    if not any(statements for statements, _ in jobs):
+        return
+    with db_lock, _transaction(conn):
+        for statements, _ in jobs:
+            for sql, params, many in statements:
+                if many:
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+
+
+def _checkpoint(conn: sqlite3.Connection, db_lock: threading.Lock):
+    """Copy committed WAL pages back into the database without blocking readers"""
+    try:
+        with db_lock:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    except sqlite3.Error as e:
+        print(f"⚠️ Refinement WAL checkpoint failed: {e}")
+
+
+def _writer_loop(write_queue: queue.Queue, conn: sqlite3.Connection, db_lock: threading.Lock,
+                 write_errors: deque):
+    """
+    Drain the write queue, committing each burst of queued jobs as one transaction
+    
+    Runs on the writer thread without a reference to its RefinementLoopSystem, so an
+    unclosed system can still be collected; closes the connection on shutdown
+    """
+    running = True
+    uncheckpointed = 0
+    while running:
+        try:
+            # Only wait with a timeout while there is WAL content left to checkpoint
+            timeout = _CHECKPOINT_IDLE_SECONDS if uncheckpointed else None
+            jobs = [write_queue.get(timeout=timeout)]
+        except queue.Empty:
+            _checkpoint(conn, db_lock)
+            uncheckpointed = 0
+            continue
+        while len(jobs) < _WRITER_BATCH_JOBS:
+            try:
+                jobs.append(write_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        # None is the shutdown sentinel queued by the system's finalizer
+        running = None not in jobs
+        work = [job for job in jobs if job is not None]
+        
+        errors = [None] * len(work)
+        try:
+            _run_write_jobs(conn, db_lock, work)
+        except Exception:
+            # Retry one job per transaction so a bad job cannot roll back the others
+            for index, job in enumerate(work):
+                try:
+                    _run_write_jobs(conn, db_lock, (job,))
+                except Exception as e:
+                    errors[index] = e
+                    print(f"❌ Refinement database write failed: {e}")
+        
+        for (_, on_done), error in zip(work, errors):
+            if on_done is not None:
+                on_done(error)
+            elif error is not None:
+                write_errors.append(error)
+        for _ in jobs:
+            write_queue.task_done()
+        
+        uncheckpointed += len(work)
+        if uncheckpointed >= _CHECKPOINT_JOBS:
+            _checkpoint(conn, db_lock)
+            uncheckpointed = 0
+    
+    with db_lock:
+        conn.close()
+
+
+def _digest(text: str) -> bytes:
+    """Compact cache key for arbitrarily long text"""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
 
 class RefinementTrigger(Enum):
     FORMAT_MISMATCH = "format_mismatch"
@@ -40,6 +348,130 @@ class RefinementAction(Enum):
     SPLIT_REQUEST = "split_request"
 
 
+# Refinement prompt templates per action, filled with str.format_map
+_ACTION_TEMPLATES = {
+    RefinementAction.CLARIFY_FORMAT: """
+The previous response didn't match the required format. 
+
+ISSUES DETECTED:
+{issues}
+
+ORIGINAL REQUEST:
+{original_prompt}
+
+PREVIOUS RESPONSE:
+{failed_response}
+
+REQUIRED FORMAT:
+{expected_output}
+
+Please provide a response that EXACTLY matches the required format. Pay special attention to:
+1. Use the exact format specified
+2. Include all required fields
+3. Ensure proper data types
+4. No additional text outside the format
+
+Corrected response:
+""",
+    RefinementAction.REQUEST_MISSING_DATA: """
+Your previous response was missing required information.
+
+MISSING ELEMENTS:
+{issues}
+
+ORIGINAL REQUEST:
+{original_prompt}
+
+PREVIOUS INCOMPLETE RESPONSE:
+{failed_response}
+
+Please provide a COMPLETE response that includes:
+{expected_output}
+
+Make sure to address all missing elements identified above.
+
+Complete response:
+""",
+    RefinementAction.PROVIDE_EXAMPLES: """
+The format wasn't clear from the previous response. Here's exactly what I need:
+
+ORIGINAL REQUEST:
+{original_prompt}
+
+EXACT FORMAT REQUIRED:
+{expected_output}
+
+EXAMPLE of correct format:
+{example}
+
+ISSUES WITH PREVIOUS RESPONSE:
+{issues}
+
+Please provide your response using EXACTLY the format shown in the example above.
+
+Response:
+""",
+    RefinementAction.SIMPLIFY_REQUEST: """
+Let me simplify the request to make it clearer:
+
+SIMPLIFIED REQUEST:
+{simplified_prompt}
+
+REQUIRED OUTPUT FORMAT:
+{expected_output}
+
+ISSUES TO AVOID:
+{issues}
+
+Please provide a response that follows the format exactly.
+
+Response:
+""",
+    RefinementAction.FIX_STRUCTURE: """
+The structure of your previous response needs correction.
+
+STRUCTURAL ISSUES:
+{issues}
+
+CORRECT STRUCTURE NEEDED:
+{expected_output}
+
+PREVIOUS RESPONSE (with issues):
+{failed_response}
+
+Please reformat your response to match the correct structure exactly.
+
+Corrected response:
+"""
+}
+
+_FIX_DESCRIPTIONS = {
+    RefinementAction.CLARIFY_FORMAT: "Correct the output format to match specifications",
+    RefinementAction.REQUEST_MISSING_DATA: "Include all missing required fields and data",
+    RefinementAction.FIX_STRUCTURE: "Restructure the response to match expected format",
+    RefinementAction.PROVIDE_EXAMPLES: "Follow the provided example format exactly",
+    RefinementAction.SIMPLIFY_REQUEST: "Address the simplified, clearer request",
+    RefinementAction.SPLIT_REQUEST: "Address each part of the split request separately"
+}
+
+# Preset zlib dictionary for packed attempt text, which is mostly the templates above;
+# payloads name it by digest and the bytes are kept in the database for decoding
+_PACK_ZDICT = "".join(
+    [*_ACTION_TEMPLATES.values(), *_FIX_DESCRIPTIONS.values(), ". Specific issues: "]
+).encode("utf-8")
+_PACK_ZDICT_ID = hashlib.blake2b(_PACK_ZDICT, digest_size=8).digest()
+
+# Issue keywords in precedence order, found with a single regex pass per issue
+_ISSUE_KEYWORD_RE = re.compile(r"format|missing|structure|incomplete|invalid")
+_ISSUE_TRIGGERS = (
+    ("format", RefinementTrigger.FORMAT_MISMATCH),
+    ("missing", RefinementTrigger.MISSING_FIELDS),
+    ("structure", RefinementTrigger.MISSING_FIELDS),
+    ("incomplete", RefinementTrigger.INCOMPLETE_RESPONSE),
+    ("invalid", RefinementTrigger.INVALID_DATA)
+)
+
+
 @dataclass
 class RefinementRule:
     """Defines conditions and actions for refinement"""
@@ -73,26 +505,191 @@ class RefinementSession:
     original_prompt: str
     target_output: str
     service: ServiceType
-    attempts: List[RefinementAttempt]
+    attempt_ids: List[str]  # full attempts live in the database, not in memory
+    attempt_scores: List[float]  # quality score that triggered each attempt
     final_success: bool
     total_attempts: int
     time_elapsed: float
     final_quality_score: float
 
 
+@dataclass
+class _ExpectedOutput:
+    """Expected output parsed once per refinement session"""
+    text: str
+    digest: bytes
+    keys: Optional[Tuple[str, ...]]  # top-level keys when the text is a JSON object
+    word_counts: Optional[Counter]  # lowercase word counts for the text fallback
+    word_total: int
+
+    @classmethod
+    def from_text(cls, expected_output: str) -> "_ExpectedOutput":
+        try:
+            parsed = json.loads(expected_output)
+        except (ValueError, RecursionError):
+            parsed = None
+        
+        if isinstance(parsed, dict):
+            return cls(expected_output, _digest(expected_output), tuple(parsed.keys()), None, 0)
+        
+        word_counts = Counter(expected_output.lower().split())
+        return cls(expected_output, _digest(expected_output), None, word_counts, sum(word_counts.values()))
+
+
+class _ColumnStore:
+    """Column-oriented (SoA) buffer of pending rows for a batched executemany"""
+    __slots__ = ("columns",)
+
+    def __init__(self, width: int):
+        self.columns = tuple([] for _ in range(width))
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def append(self, row: Tuple) -> None:
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def rows(self) -> Iterator[Tuple]:
+        return zip(*self.columns)
+
+    def take(self) -> "_ColumnStore":
+        """Move the buffered rows into a new store, leaving this one empty"""
+        taken = _ColumnStore(0)
+        taken.columns, self.columns = self.columns, tuple([] for _ in self.columns)
+        return taken
+
+
+# Column counts of the buffered refinement_attempts and quality_metrics rows; the
+# first _ATTEMPT_ROW_COLUMNS attempt columns form the row, the rest is packed text
+_ATTEMPT_COLUMNS = 10
+_ATTEMPT_ROW_COLUMNS = 7
+_METRIC_COLUMNS = 5
+
+# Packed attempt text: a format byte, then zlib over length-prefixed UTF-8 fields;
+# the dictionary format puts the 8-byte id of its preset dictionary after the byte
+_PACK_FORMAT_ZLIB = 1
+_PACK_FORMAT_ZDICT = 2
+_PACK_ZDICT_ID_SIZE = 8
+_PACKED_FIELD_LEN = struct.Struct("<I")
+_PACKED_FIELDS = ("attempt_id", "refinement_prompt", "expected_fix", "response_received")
+_RESPONSE_BYTES_LIMIT = 1000
+
+# Buffered rows per table that trigger an early batch write
+_PENDING_FLUSH_ROWS = 512
+
+# Queued write jobs the writer thread folds into one transaction
+_WRITER_BATCH_JOBS = 64
+
+# The writer checkpoints the WAL itself: once idle for this long, or after this many jobs
+_CHECKPOINT_IDLE_SECONDS = 30.0
+_CHECKPOINT_JOBS = 4096
+
+# How long a cached row timestamp stays current, in seconds
+_NOW_ISO_TTL = 0.001
+
+
+def _pending_statements(
+    pending_attempts: _ColumnStore,
+    pending_metrics: _ColumnStore,
+    db_lock: threading.Lock,
+    now: str
+) -> List[Tuple[str, Any, bool]]:
+    """Take the buffered rows out of the pending stores and return the statements that insert them"""
+    with db_lock:
+        if not pending_attempts and not pending_metrics:
+            return []
+        attempts, metrics = pending_attempts.take(), pending_metrics.take()
+    
+    # Narrow attempt rows feed the statistics; the bulky text is packed once per session
+    columns = attempts.columns
+    packed = {}
+    for session_id, attempt_id, prompt, fix, response in zip(
+        columns[1], columns[0], *columns[_ATTEMPT_ROW_COLUMNS:]
+    ):
+        packed.setdefault(session_id, []).append((attempt_id, prompt, fix, response))
+    packed_rows = [
+        (session_id, len(items), _pack_attempts(items, (_PACK_ZDICT_ID, _PACK_ZDICT)), now) for session_id, items in packed.items()
+    ]
+    
+    # Materialized so the writer can replay the rows if it has to retry the job alone
+    return [
+        (_INSERT_ATTEMPT_SQL, list(zip(*columns[:_ATTEMPT_ROW_COLUMNS])), True),
+        (_INSERT_PACKED_ATTEMPTS_SQL, packed_rows, True),
+        (_INSERT_METRIC_SQL, list(metrics.rows()), True)
+    ]
+
+
+def _shutdown_refinement_db(
+    pending_attempts: _ColumnStore,
+    pending_metrics: _ColumnStore,
+    db_lock: threading.Lock,
+    write_queue: queue.Queue,
+    writer: threading.Thread
+):
+    """Queue the still-buffered rows, then stop the writer, which closes the connection"""
+    statements = _pending_statements(pending_attempts, pending_metrics, db_lock, datetime.now().isoformat())
+    if statements:
+        write_queue.put((tuple(statements), None))
+    write_queue.put(None)
+    # A collection can run on the writer thread itself; it then exits after this job
+    if writer is not threading.current_thread():
+        writer.join()
+
+
 class RefinementLoopSystem:
-    """Manages automatic refinement loops for web service outputs"""
+    """Manages automatic refinement loops for web service outputs
     
-    def __init__(self, memory_dir: str = "memory", session_id: str = "default"):
+    Refinement telemetry is monitoring data. With durable=False the database runs
+    with synchronous=OFF and an in-memory journal: writes are much faster, but an
+    OS crash or power loss can drop recent rows or corrupt the database file.
+    """
+    
+    def __init__(
+        self,
+        memory_dir: str = "memory",
+        session_id: str = "default",
+        max_candidates: int = 1,
+        min_request_interval: float = 1.0,
+        durable: bool = True
+    ):
         self.memory_dir = Path(memory_dir)
         self.memory_dir.mkdir(exist_ok=True)
         self.db_path = self.memory_dir / "refinement_loops.db"
+        self.durable = durable
         self.session_id = session_id
         self.llm_client = LocalLLMClient()
         self.optimizer = MachineLanguageOptimizer(memory_dir, session_id + "_refine_opt")
         
+        # Refinement prompts dispatched concurrently per attempt; 1 keeps the loop sequential
+        self.max_candidates = max(1, max_candidates)
+        
+        # Minimum spacing between service requests; only the residual is slept
+        self.min_request_interval = min_request_interval
+        self._last_request_ts = float("-inf")
+        
+        # (monotonic time, ISO timestamp) reused by row timestamps taken within the same millisecond
+        self._now_iso_cache = (float("-inf"), "")
+        
+        # Scored responses keyed by (response hash, expected hash, format)
+        self._analysis_cache = OrderedDict()
+        self._analysis_cache_size = 4096
+        
+        # Format compliance checker per output format, bound once per session
+        self._format_checkers = {
+            OutputFormat.JSON: self._check_json_format,
+            OutputFormat.STRUCTURED_TEXT: self._check_structured_text_format,
+            OutputFormat.MARKDOWN: self._check_markdown_format
+        }
+        
+        # Successful LLM helper outputs keyed by (input hash, service)
+        self._example_cache = OrderedDict()
+        self._simplify_cache = OrderedDict()
+        self._llm_cache_size = 256
+        
         # Refinement rules and patterns
         self.refinement_rules = []
+        self._rules_index = {}  # (trigger, service or None) -> [(-priority, order, rule)]
         self.success_patterns = {}
         self.failure_patterns = {}
         
@@ -104,95 +701,206 @@ class RefinementLoopSystem:
             "service_performance": {}
         }
         
+        # Long-lived connection shared by every read and write, closed at exit at the latest
+        self._conn = self._connect()
+        self._db_lock = threading.Lock()
+        self._closed = False
+        
+        # Attempt and metric rows waiting for the end-of-session batch write
+        self._pending_attempts = _ColumnStore(_ATTEMPT_COLUMNS)
+        self._pending_metrics = _ColumnStore(_METRIC_COLUMNS)
+        
         self.init_database()
+        
+        # Stored rule definitions and success rates, so unchanged rules are never rewritten
+        self._rule_cache = self._load_rule_cache()
+        
+        # Single writer thread owns every commit so the event loop never waits on fsync;
+        # the last failed job nobody waits on is kept for the next awaited write to raise
+        self._write_queue = queue.Queue()
+        self._write_errors = deque(maxlen=1)
+        self._writer = threading.Thread(
+            target=_writer_loop, name="refinement-writer", daemon=True,
+            args=(self._write_queue, self._conn, self._db_lock, self._write_errors)
+        )
+        self._writer.start()
+        
+        # Shut down on collection or at exit at the latest; neither the writer thread
+        # nor the finalizer holds a strong reference back to the system
+        self._finalizer = weakref.finalize(
+            self, _shutdown_refinement_db, self._pending_attempts, self._pending_metrics,
+            self._db_lock, self._write_queue, self._writer
+        )
+        
         self._load_default_rules()
         print(f"🔄 RefinementLoopSystem initialized for session {session_id}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open the refinement database with tuned journaling and pragmas"""
+        # Autocommit: the module never opens transactions implicitly, _txn issues BEGIN/COMMIT
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256, isolation_level=None
+        )
+        self._init_pragmas(conn)
+        # Named column access without per-row zip in Python
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def _init_pragmas(self, conn: sqlite3.Connection):
+        """Apply journaling, durability and cache pragmas to a new connection"""
+        if str(self.db_path) != ":memory:":
+            # In-memory databases have no file to journal or map
+            if self.durable:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                # Commits never run a checkpoint; the writer thread does it off the request path
+                conn.execute("PRAGMA wal_autocheckpoint=0")
+            else:
+                # Telemetry may lose its latest rows on a crash in exchange for no fsyncs
+                conn.execute("PRAGMA journal_mode=MEMORY")
+                conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+        conn.execute("PRAGMA busy_timeout=5000")
+    
     def init_database(self):
         """Initialize refinement loop database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Refinement rules table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS refinement_rules (
-                rule_id TEXT PRIMARY KEY,
-                trigger TEXT,
-                condition_desc TEXT,
-                action TEXT,
-                priority INTEGER,
-                max_attempts INTEGER,
-                service_specific TEXT,
-                success_rate REAL,
-                created_at TEXT
-            )
-        ''')
-        
-        # Refinement sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS refinement_sessions (
-                session_id TEXT PRIMARY KEY,
-                original_prompt TEXT,
-                target_output TEXT,
-                service TEXT,
-                final_success BOOLEAN,
-                total_attempts INTEGER,
-                time_elapsed REAL,
-                final_quality_score REAL,
-                created_at TEXT,
-                completed_at TEXT
-            )
-        ''')
-        
-        # Refinement attempts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS refinement_attempts (
-                attempt_id TEXT PRIMARY KEY,
-                session_id TEXT,
-                refinement_number INTEGER,
-                trigger_reason TEXT,
-                refinement_prompt TEXT,
-                expected_fix TEXT,
-                service TEXT,
-                response_received TEXT,
-                attempt_success BOOLEAN,
-                quality_improvement REAL,
-                timestamp TEXT,
-                FOREIGN KEY (session_id) REFERENCES refinement_sessions (session_id)
-            )
-        ''')
-        
-        # Success patterns table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS success_patterns (
-                pattern_id TEXT PRIMARY KEY,
-                service TEXT,
-                trigger_type TEXT,
-                successful_prompt_pattern TEXT,
-                success_count INTEGER,
-                failure_count INTEGER,
-                effectiveness_score REAL,
-                last_updated TEXT
-            )
-        ''')
-        
-        # Quality metrics table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quality_metrics (
-                metric_id TEXT PRIMARY KEY,
-                session_id TEXT,
-                attempt_number INTEGER,
-                format_compliance REAL,
-                content_accuracy REAL,
-                completeness_score REAL,
-                structure_validity REAL,
-                overall_quality REAL,
-                timestamp TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        # Schema, indexes and ANALYZE commit together; a failure rolls all of them back
+        with self._db_lock, self._txn() as conn:
+            # Refinement rules table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS refinement_rules (
+                    rule_id TEXT PRIMARY KEY,
+                    trigger TEXT,
+                    condition_desc TEXT,
+                    action TEXT,
+                    priority INTEGER,
+                    max_attempts INTEGER,
+                    service_specific TEXT,
+                    success_rate REAL,
+                    created_at TEXT
+                )
+            ''')
+            
+            # Refinement sessions table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS refinement_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    original_prompt TEXT,
+                    target_output TEXT,
+                    service TEXT,
+                    final_success BOOLEAN,
+                    total_attempts INTEGER,
+                    time_elapsed REAL,
+                    final_quality_score REAL,
+                    created_at TEXT,
+                    completed_at TEXT
+                )
+            ''')
+            
+            # Refinement attempts table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS refinement_attempts (
+                    attempt_id TEXT PRIMARY KEY,
+                    session_id TEXT,
+                    refinement_number INTEGER,
+                    trigger_reason TEXT,
+                    refinement_prompt TEXT,
+                    expected_fix TEXT,
+                    service TEXT,
+                    response_received TEXT,
+                    attempt_success BOOLEAN,
+                    quality_improvement REAL,
+                    timestamp TEXT,
+                    FOREIGN KEY (session_id) REFERENCES refinement_sessions (session_id)
+                )
+            ''')
+            
+            # Success patterns table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS success_patterns (
+                    pattern_id TEXT PRIMARY KEY,
+                    service TEXT,
+                    trigger_type TEXT,
+                    successful_prompt_pattern TEXT,
+                    success_count INTEGER,
+                    failure_count INTEGER,
+                    effectiveness_score REAL,
+                    last_updated TEXT
+                )
+            ''')
+            
+            # Quality metrics table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS quality_metrics (
+                    metric_id TEXT PRIMARY KEY,
+                    session_id TEXT,
+                    attempt_number INTEGER,
+                    format_compliance REAL,
+                    content_accuracy REAL,
+                    completeness_score REAL,
+                    structure_validity REAL,
+                    overall_quality REAL,
+                    timestamp TEXT
+                )
+            ''')
+            
+            # Attempt text packed into one compressed blob per session flush
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS refinement_attempts_packed (
+                    pack_id INTEGER PRIMARY KEY,
+                    session_id TEXT,
+                    attempt_count INTEGER,
+                    payload BLOB,
+                    created_at TEXT
+                )
+            ''')
+            
+            # Preset compression dictionaries referenced by packed attempt payloads
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS refinement_pack_dicts (
+                    dict_id BLOB PRIMARY KEY,
+                    zdict BLOB
+                )
+            ''')
+            conn.execute(_INSERT_PACK_DICT_SQL, (_PACK_ZDICT_ID, _PACK_ZDICT))
+            
+            # Indexes for session lookups and the statistics aggregations
+            conn.execute("DROP INDEX IF EXISTS idx_attempts_session")  # Superseded by the composite below
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_attempts_session_number
+                ON refinement_attempts(session_id, refinement_number)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_metrics_session
+                ON quality_metrics(session_id, attempt_number)
+            ''')
+            # Covering index: the quality aggregate reads this column only, never the wide rows
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_metrics_quality
+                ON quality_metrics(overall_quality)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_rules_priority
+                ON refinement_rules(priority DESC, success_rate DESC)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_attempts_trigger
+                ON refinement_attempts(trigger_reason)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_service
+                ON refinement_sessions(service, final_success, total_attempts)
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_packed_session
+                ON refinement_attempts_packed(session_id)
+            ''')
+            
+            # Refresh planner statistics once per start, sampling rows so large histories stay cheap
+            conn.execute("PRAGMA analysis_limit=1000")
+            conn.execute("ANALYZE")
     
     async def execute_refinement_loop(
         self,
@@ -211,21 +919,28 @@ class RefinementLoopSystem:
             original_prompt=original_prompt,
             target_output=expected_output,
             service=service,
-            attempts=[],
+            attempt_ids=[],
+            attempt_scores=[],
             final_success=False,
             total_attempts=0,
             time_elapsed=0.0,
             final_quality_score=0.0
         )
         
-        # Store initial session
-        self._store_refinement_session(session)
+        # The session row is only written once the loop has finished
+        created_at = self._get_now_iso()
         
         # Start with optimized prompt
         current_prompt = self.optimizer.optimize_for_service(
             original_prompt, service, expected_output, output_format
         ).optimized_prompt
         
+        candidate_prompts = [current_prompt]
+        candidate_actions: List[RefinementAction] = []
+        # (attempt, response, issues, improved) of the last refinement, stored once its winner is known
+        pending_attempt = None
+        expected = _ExpectedOutput.from_text(expected_output)
+        format_checker = self._format_checkers.get(output_format, self._check_default_format)
         current_quality = 0.0
         refinement_count = 0
         
@@ -237,20 +952,42 @@ class RefinementLoopSystem:
             
             print(f"🔄 Refinement attempt {refinement_count}/{max_refinements}")
             
-            # Send request (mock for now - would integrate with web automation)
-            response = await self._send_mock_request(current_prompt, service)
+            # Send every candidate prompt concurrently (mock for now - would integrate with web automation)
+            await self._throttle_requests()
+            responses = await asyncio.gather(*(
+                self._send_mock_request(prompt, service) for prompt in candidate_prompts
+            ))
+            self._last_request_ts = time.monotonic()
             
-            # Analyze response quality and issues
-            quality_score, issues = await self._analyze_response_quality(
-                response, expected_output, output_format
-            )
+            # Analyze response quality and issues, keeping the best-scoring candidate
+            analyses = await asyncio.gather(*(
+                self._analyze_response_quality(
+                    candidate, expected_output, output_format, expected, format_checker
+                )
+                for candidate in responses
+            ))
+            best = max(range(len(analyses)), key=lambda index: analyses[index][0])
+            current_prompt = candidate_prompts[best]
+            response = responses[best]
+            quality_score, issues = analyses[best]
+            
+            # Record the candidate that actually won, not the one tried first
+            if pending_attempt is not None:
+                attempt, attempt_response, attempt_issues, improved = pending_attempt
+                attempt.refinement_prompt = current_prompt
+                attempt.expected_fix = self._describe_expected_fix(candidate_actions[best], attempt_issues)
+                self._store_refinement_attempt(attempt, attempt_response, improved)
+                pending_attempt = None
             
             print(f"📊 Quality score: {quality_score:.2f}")
             if issues:
                 print(f"⚠️ Issues detected: {', '.join(issues[:2])}")
             
+            # One timestamp serves this iteration's metric and attempt rows
+            now_iso = self._get_now_iso()
+            
             # Store quality metrics
-            self._store_quality_metrics(session.session_id, refinement_count, quality_score)
+            self._store_quality_metrics(session.session_id, refinement_count, quality_score, now_iso=now_iso)
             
             # Check if quality is acceptable
             if quality_score >= quality_threshold:
@@ -264,12 +1001,17 @@ class RefinementLoopSystem:
                 issues, service, refinement_count
             )
             
-            # Generate refinement prompt
-            refinement_prompt = await self._generate_refinement_prompt(
-                current_prompt, response, issues, refinement_action, service, expected_output
-            )
+            # Generate one refinement prompt per candidate action, the chosen action first
+            candidate_actions = self._candidate_actions(refinement_action, refinement_count)
+            candidate_prompts = list(await asyncio.gather(*(
+                self._generate_refinement_prompt(
+                    current_prompt, response, issues, action, service, expected_output
+                )
+                for action in candidate_actions
+            )))
+            refinement_prompt = candidate_prompts[0]
             
-            # Create refinement attempt record
+            # Create refinement attempt record for the chosen action until a winner is scored
             attempt = RefinementAttempt(
                 attempt_id=str(uuid.uuid4()),
                 original_request_id=session.session_id,
@@ -278,18 +1020,22 @@ class RefinementLoopSystem:
                 refinement_prompt=refinement_prompt,
                 expected_fix=self._describe_expected_fix(refinement_action, issues),
                 service=service,
-                timestamp=datetime.now().isoformat()
+                timestamp=now_iso
             )
             
-            session.attempts.append(attempt)
-            self._store_refinement_attempt(attempt, response, quality_score > current_quality)
+            # Only the id and score stay on the session; the row carries the prompt to the database
+            session.attempt_ids.append(attempt.attempt_id)
+            session.attempt_scores.append(quality_score)
+            pending_attempt = (attempt, response, issues, quality_score > current_quality)
             
             # Update current prompt for next iteration
             current_prompt = refinement_prompt
             current_quality = quality_score
-            
-            # Brief delay to avoid overwhelming the service
-            await asyncio.sleep(1)
+        
+        # A last refinement that was never sent keeps the chosen action
+        if pending_attempt is not None:
+            attempt, attempt_response, _, improved = pending_attempt
+            self._store_refinement_attempt(attempt, attempt_response, improved)
         
         # Finalize session
         session.total_attempts = refinement_count
@@ -300,8 +1046,8 @@ class RefinementLoopSystem:
             print(f"❌ Failed to reach quality threshold after {max_refinements} attempts")
             print(f"📊 Final quality: {current_quality:.2f}")
         
-        # Update session in database
-        self._update_refinement_session(session)
+        # Commit the session's attempts, metrics and final results together
+        await self._write_and_wait(self._finalize_session(session, created_at))
         
         # Update success patterns
         self._update_success_patterns(session)
@@ -309,6 +1055,23 @@ class RefinementLoopSystem:
         print(f"⏱️ Refinement loop completed in {session.time_elapsed:.2f}s")
         return session
     
+    def _get_now_iso(self) -> str:
+        """Current ISO timestamp, refreshed at most once per millisecond"""
+        checked, now_iso = self._now_iso_cache
+        current = time.monotonic()
+        if current - checked > _NOW_ISO_TTL:
+            now_iso = datetime.now().isoformat()
+            self._now_iso_cache = (current, now_iso)
+        return now_iso
+    
+    async def _throttle_requests(self):
+        """Wait out whatever remains of the minimum interval since the last request"""
+        
+        wait = self.min_request_interval - (time.monotonic() - self._last_request_ts)
+        if wait > 0:
+            # Brief delay to avoid overwhelming the service
+            await asyncio.sleep(wait)
+    
     async def _send_mock_request(self, prompt: str, service: ServiceType) -> str:
         """Mock web request - would be replaced with actual web automation"""
         
@@ -330,15 +1093,46 @@ class RefinementLoopSystem:
         self,
         response: str,
         expected_output: str,
-        output_format: OutputFormat
+        output_format: OutputFormat,
+        expected: Optional[_ExpectedOutput] = None,
+        format_checker: Optional[Callable[[str], float]] = None
     ) -> Tuple[float, List[str]]:
         """Analyze response quality and identify issues"""
         
+        if expected is None:
+            expected = _ExpectedOutput.from_text(expected_output)
+        
+        # Scoring is deterministic, so repeated responses reuse the earlier result
+        key = (_digest(response), expected.digest, output_format)
+        cached = self._analysis_cache.get(key)
+        if cached is None:
+            cached = self._score_response(response, expected, output_format, format_checker)
+            self._analysis_cache[key] = cached
+            if len(self._analysis_cache) > self._analysis_cache_size:
+                self._analysis_cache.popitem(last=False)
+        else:
+            self._analysis_cache.move_to_end(key)
+        
+        overall_quality, issues = cached
+        return overall_quality, list(issues)
+    
+    def _score_response(
+        self,
+        response: str,
+        expected: _ExpectedOutput,
+        output_format: OutputFormat,
+        format_checker: Optional[Callable[[str], float]] = None
+    ) -> Tuple[float, Tuple[str, ...]]:
+        """Score a response and collect its issues"""
+        
         issues = []
         quality_components = {}
+        response_lower = response.lower()
         
         # Format compliance check
-        format_score = self._check_format_compliance(response, output_format)
+        if format_checker is None:
+            format_checker = self._format_checkers.get(output_format, self._check_default_format)
+        format_score = format_checker(response)
         quality_components['format'] = format_score
         
         if format_score < 0.5:
@@ -348,21 +1142,21 @@ class RefinementLoopSystem:
                 issues.append(f"Response doesn't match {output_format.value} format")
         
         # Structure compliance check
-        structure_score = self._check_structure_compliance(response, expected_output)
+        structure_score = self._check_structure_compliance(response, expected.text, response_lower, expected)
         quality_components['structure'] = structure_score
         
         if structure_score < 0.5:
             issues.append("Response missing required structure elements")
         
         # Content completeness check
-        completeness_score = self._check_content_completeness(response, expected_output)
+        completeness_score = _completeness_score(len(response))
         quality_components['completeness'] = completeness_score
         
         if completeness_score < 0.5:
             issues.append("Response appears incomplete or too brief")
         
         # Content accuracy check (simplified)
-        accuracy_score = self._check_content_accuracy(response)
+        accuracy_score = self._check_content_accuracy(response, response_lower)
         quality_components['accuracy'] = accuracy_score
         
         if accuracy_score < 0.5:
@@ -372,94 +1166,90 @@ class RefinementLoopSystem:
         weights = {'format': 0.3, 'structure': 0.3, 'completeness': 0.2, 'accuracy': 0.2}
         overall_quality = sum(score * weights[component] for component, score in quality_components.items())
         
-        return overall_quality, issues
+        return overall_quality, tuple(issues)
     
     def _check_format_compliance(self, response: str, output_format: OutputFormat) -> float:
         """Check if response complies with expected format"""
-        
-        if output_format == OutputFormat.JSON:
+        return self._format_checkers.get(output_format, self._check_default_format)(response)
+    
+    def _check_json_format(self, response: str) -> float:
+        """Format compliance for JSON output"""
+        # Only parse when the first character can start a JSON value; prose skips the exception path
+        stripped = response.strip()
+        if stripped and stripped[0] in _JSON_START_CHARS:
             try:
-                json.loads(response.strip())
+                _json_loads(stripped)
                 return 1.0
-            except:
-                # Check if it contains JSON-like structure
-                if '{' in response and '}' in response:
-                    return 0.3
-                return 0.0
-        
-        elif output_format == OutputFormat.STRUCTURED_TEXT:
-            # Look for field labels and structured content
-            if ':' in response and '\n' in response:
-                return 0.8
-            elif ':' in response:
-                return 0.5
-            return 0.2
-        
-        elif output_format == OutputFormat.MARKDOWN:
-            # Look for markdown indicators
-            md_indicators = ['#', '**', '*', '-', '```']
-            found = sum(1 for indicator in md_indicators if indicator in response)
-            return min(found * 0.2, 1.0)
-        
-        return 0.5  # Default for other formats
-    
-    def _check_structure_compliance(self, response: str, expected_output: str) -> float:
+            except (ValueError, RecursionError):
+                pass
+        
+        # Check if it contains JSON-like structure
+        if '{' in response and '}' in response:
+            return 0.3
+        return 0.0
+    
+    def _check_structured_text_format(self, response: str) -> float:
+        """Format compliance for structured text output"""
+        # Look for field labels and structured content
+        if ':' in response and '\n' in response:
+            return 0.8
+        elif ':' in response:
+            return 0.5
+        return 0.2
+    
+    def _check_markdown_format(self, response: str) -> float:
+        """Format compliance for markdown output"""
+        # Look for markdown indicators ('**' also implies '*')
+        found = set(_MARKDOWN_RE.findall(response))
+        if "**" in found:
+            found.add("*")
+        return min(len(found) * 0.2, 1.0)
+    
+    def _check_default_format(self, response: str) -> float:
+        """Format compliance for other formats"""
+        return 0.5
+    
+    def _check_structure_compliance(
+        self,
+        response: str,
+        expected_output: str,
+        response_lower: Optional[str] = None,
+        expected: Optional[_ExpectedOutput] = None
+    ) -> float:
         """Check if response has expected structure"""
         
-        try:
-            expected_structure = json.loads(expected_output)
-            if isinstance(expected_structure, dict):
-                # Check for required keys
-                required_keys = expected_structure.keys()
-                found_keys = 0
-                
-                for key in required_keys:
-                    if key in response:
-                        found_keys += 1
-                
-                return found_keys / len(required_keys) if required_keys else 0.5
-        except:
-            # Fall back to text-based checking
-            pass
-        
-        # Simple text-based structure checking
-        expected_words = expected_output.lower().split()
-        response_words = response.lower().split()
-        
-        matches = sum(1 for word in expected_words if word in response_words)
-        return matches / len(expected_words) if expected_words else 0.0
+        if expected is None:
+            expected = _ExpectedOutput.from_text(expected_output)
+        
+        if expected.keys is not None:
+            # Check for required keys
+            required_keys = expected.keys
+            found_keys = sum(1 for key in required_keys if key in response)
+            return _ratio_score(found_keys, len(required_keys), 0.5)
+        
+        # Simple text-based structure checking (repeated expected words count each time)
+        expected_words = expected.word_counts
+        response_words = set((response.lower() if response_lower is None else response_lower).split())
+        
+        matches = sum(expected_words[word] for word in expected_words.keys() & response_words)
+        return _ratio_score(matches, expected.word_total, 0.0)
     
     def _check_content_completeness(self, response: str, expected_output: str) -> float:
         """Check if response is complete"""
         
         # Length-based completeness check
-        if len(response) < 20:
-            return 0.1
-        elif len(response) < 50:
-            return 0.4
-        elif len(response) > 200:
-            return 1.0
-        else:
-            return len(response) / 200
+        return _completeness_score(len(response))
     
-    def _check_content_accuracy(self, response: str) -> float:
+    def _check_content_accuracy(self, response: str, response_lower: Optional[str] = None) -> float:
         """Check content accuracy (simplified heuristic)"""
         
-        # Look for uncertainty indicators
-        uncertainty_words = ['maybe', 'perhaps', 'might', 'could be', 'not sure']
-        uncertainty_count = sum(1 for word in uncertainty_words if word in response.lower())
-        
-        # Look for confident language
-        confident_words = ['is', 'are', 'will', 'must', 'definitely']
-        confident_count = sum(1 for word in confident_words if word in response.lower())
+        text = response.lower() if response_lower is None else response_lower
         
-        # Simple scoring
-        if uncertainty_count > confident_count:
-            return 0.3
-        elif confident_count > 0:
-            return 0.8
-        else:
-            return 0.5
+        # Uncertainty indicators against confident language
+        return _accuracy_score(
+            len(set(_UNCERTAINTY_RE.findall(text))),
+            len(set(_CONFIDENCE_RE.findall(text)))
+        )
     
     def _determine_refinement_strategy(
         self,
@@ -469,45 +1259,51 @@ class RefinementLoopSystem:
     ) -> Tuple[RefinementTrigger, RefinementAction]:
         """Determine the best refinement strategy based on issues"""
         
-        # Analyze issues to determine trigger
+        # Analyze issues to determine trigger: first issue naming a keyword wins
         trigger = RefinementTrigger.CONTENT_MISMATCH  # Default
         
         for issue in issues:
-            if "format" in issue.lower():
-                trigger = RefinementTrigger.FORMAT_MISMATCH
-                break
-            elif "missing" in issue.lower() or "structure" in issue.lower():
-                trigger = RefinementTrigger.MISSING_FIELDS
-                break
-            elif "incomplete" in issue.lower():
-                trigger = RefinementTrigger.INCOMPLETE_RESPONSE
-                break
-            elif "invalid" in issue.lower():
-                trigger = RefinementTrigger.INVALID_DATA
+            found = set(_ISSUE_KEYWORD_RE.findall(issue.lower()))
+            if found:
+                trigger = next(mapped for keyword, mapped in _ISSUE_TRIGGERS if keyword in found)
                 break
         
-        # Find matching rules
-        matching_rules = [
-            rule for rule in self.refinement_rules
-            if rule.trigger == trigger and 
-            (rule.service_specific is None or rule.service_specific == service) and
-            attempt_number <= rule.max_attempts
-        ]
+        # Highest priority eligible rule among the service-specific and generic rules
+        best_rule = None
+        for key in ((trigger, service), (trigger, None)):
+            for entry in self._rules_index.get(key, ()):
+                if attempt_number <= entry[2].max_attempts:
+                    if best_rule is None or entry[:2] < best_rule[:2]:
+                        best_rule = entry
+                    break
         
-        if matching_rules:
-            # Use highest priority rule
-            best_rule = max(matching_rules, key=lambda r: r.priority)
-            return trigger, best_rule.action
+        if best_rule is not None:
+            return trigger, best_rule[2].action
+        
+        return trigger, self._fallback_action(attempt_number)
+    
+    def _fallback_action(self, attempt_number: int) -> RefinementAction:
+        """Fallback refinement action based on attempt number"""
         
-        # Fallback strategy based on attempt number
         if attempt_number == 1:
-            return trigger, RefinementAction.CLARIFY_FORMAT
+            return RefinementAction.CLARIFY_FORMAT
         elif attempt_number == 2:
-            return trigger, RefinementAction.PROVIDE_EXAMPLES
+            return RefinementAction.PROVIDE_EXAMPLES
         elif attempt_number >= 3:
-            return trigger, RefinementAction.SIMPLIFY_REQUEST
+            return RefinementAction.SIMPLIFY_REQUEST
         
-        return trigger, RefinementAction.CLARIFY_FORMAT
+        return RefinementAction.CLARIFY_FORMAT
+    
+    def _candidate_actions(self, action: RefinementAction, attempt_number: int) -> List[RefinementAction]:
+        """Distinct refinement actions to try in parallel, the chosen action first"""
+        
+        candidates = dict.fromkeys((
+            action,
+            self._fallback_action(attempt_number),
+            RefinementAction.CLARIFY_FORMAT,
+            RefinementAction.PROVIDE_EXAMPLES
+        ))
+        return list(candidates)[:self.max_candidates]
     
     async def _generate_refinement_prompt(
         self,
@@ -520,131 +1316,41 @@ class RefinementLoopSystem:
     ) -> str:
         """Generate refinement prompt based on action and issues"""
         
-        # Base refinement templates
-        action_templates = {
-            RefinementAction.CLARIFY_FORMAT: """
-The previous response didn't match the required format. 
-
-ISSUES DETECTED:
-{issues}
-
-ORIGINAL REQUEST:
-{original_prompt}
-
-PREVIOUS RESPONSE:
-{failed_response}
-
-REQUIRED FORMAT:
-{expected_output}
-
-Please provide a response that EXACTLY matches the required format. Pay special attention to:
-1. Use the exact format specified
-2. Include all required fields
-3. Ensure proper data types
-4. No additional text outside the format
-
-Corrected response:
-""",
-            RefinementAction.REQUEST_MISSING_DATA: """
-Your previous response was missing required information.
-
-MISSING ELEMENTS:
-{issues}
-
-ORIGINAL REQUEST:
-{original_prompt}
-
-PREVIOUS INCOMPLETE RESPONSE:
-{failed_response}
-
-Please provide a COMPLETE response that includes:
-{expected_output}
-
-Make sure to address all missing elements identified above.
-
-Complete response:
-""",
-            RefinementAction.PROVIDE_EXAMPLES: """
-The format wasn't clear from the previous response. Here's exactly what I need:
-
-ORIGINAL REQUEST:
-{original_prompt}
-
-EXACT FORMAT REQUIRED:
-{expected_output}
-
-EXAMPLE of correct format:
-{example}
-
-ISSUES WITH PREVIOUS RESPONSE:
-{issues}
-
-Please provide your response using EXACTLY the format shown in the example above.
-
-Response:
-""",
-            RefinementAction.SIMPLIFY_REQUEST: """
-Let me simplify the request to make it clearer:
-
-SIMPLIFIED REQUEST:
-{simplified_prompt}
-
-REQUIRED OUTPUT FORMAT:
-{expected_output}
-
-ISSUES TO AVOID:
-{issues}
-
-Please provide a response that follows the format exactly.
-
-Response:
-""",
-            RefinementAction.FIX_STRUCTURE: """
-The structure of your previous response needs correction.
-
-STRUCTURAL ISSUES:
-{issues}
-
-CORRECT STRUCTURE NEEDED:
-{expected_output}
-
-PREVIOUS RESPONSE (with issues):
-{failed_response}
-
-Please reformat your response to match the correct structure exactly.
-
-Corrected response:
-"""
-        }
+        # Start any LLM helper first so its round trip overlaps the template work below
+        helper_task = None
+        if action == RefinementAction.PROVIDE_EXAMPLES:
+            # Generate example
+            helper_task = asyncio.create_task(self._generate_example_output(expected_output, service))
+        elif action == RefinementAction.SIMPLIFY_REQUEST:
+            # Simplify prompt
+            helper_task = asyncio.create_task(self._simplify_prompt(original_prompt, service))
         
         # Get template for action
-        template = action_templates.get(action, action_templates[RefinementAction.CLARIFY_FORMAT])
-        
-        # Generate example if needed
-        example = ""
-        if action == RefinementAction.PROVIDE_EXAMPLES:
-            example = await self._generate_example_output(expected_output, service)
+        template = _ACTION_TEMPLATES.get(action, _ACTION_TEMPLATES[RefinementAction.CLARIFY_FORMAT])
+        fields = {
+            "issues": "\n".join(["• " + issue for issue in issues]),
+            "original_prompt": original_prompt,
+            "failed_response": failed_response[:300] + "..." if len(failed_response) > 300 else failed_response,
+            "expected_output": expected_output,
+            "example": "",
+            "simplified_prompt": original_prompt
+        }
         
-        # Simplify prompt if needed
-        simplified_prompt = original_prompt
-        if action == RefinementAction.SIMPLIFY_REQUEST:
-            simplified_prompt = await self._simplify_prompt(original_prompt, service)
+        if helper_task is not None:
+            field = "example" if action == RefinementAction.PROVIDE_EXAMPLES else "simplified_prompt"
+            fields[field] = await helper_task
         
         # Format template
-        refinement_prompt = template.format(
-            issues="\n".join(f"• {issue}" for issue in issues),
-            original_prompt=original_prompt,
-            failed_response=failed_response[:300] + "..." if len(failed_response) > 300 else failed_response,
-            expected_output=expected_output,
-            example=example,
-            simplified_prompt=simplified_prompt
-        )
-        
-        return refinement_prompt
+        return template.format_map(fields)
     
     async def _generate_example_output(self, expected_output: str, service: ServiceType) -> str:
         """Generate example output using local LLM"""
         
+        key = (_digest(expected_output), service.value)
+        cached = self._cached_llm_output(self._example_cache, key)
+        if cached is not None:
+            return cached
+        
         example_prompt = f"""
 Create a realistic example that matches this structure:
 {expected_output}
@@ -652,16 +1358,26 @@ Create a realistic example that matches this structure:
 The example should be realistic and demonstrate the exact format needed.
 """
         
-        response = self.llm_client.generate_response(
+        # Blocking HTTP call runs in a worker thread so concurrent refinements overlap
+        response = await asyncio.to_thread(
+            self.llm_client.generate_response,
             example_prompt,
             "You are an expert at creating examples. Provide only the example, no explanations."
         )
         
-        return response.response if response.success else expected_output
+        if not response.success:
+            return expected_output
+        self._cache_llm_output(self._example_cache, key, response.response)
+        return response.response
     
     async def _simplify_prompt(self, original_prompt: str, service: ServiceType) -> str:
         """Simplify prompt using local LLM"""
         
+        key = (_digest(original_prompt), service.value)
+        cached = self._cached_llm_output(self._simplify_cache, key)
+        if cached is not None:
+            return cached
+        
         simplify_prompt = f"""
 Simplify this prompt to make it clearer and more direct:
 
@@ -676,26 +1392,34 @@ Make it:
 Simplified version:
 """
         
-        response = self.llm_client.generate_response(
+        response = await asyncio.to_thread(
+            self.llm_client.generate_response,
             simplify_prompt,
             f"You are an expert at simplifying prompts for {service.value}. Be concise and clear."
         )
         
-        return response.response if response.success else original_prompt
+        if not response.success:
+            return original_prompt
+        self._cache_llm_output(self._simplify_cache, key, response.response)
+        return response.response
+    
+    def _cached_llm_output(self, cache: OrderedDict, key: Tuple[bytes, str]) -> Optional[str]:
+        """LRU lookup of a previous LLM helper output"""
+        cached = cache.get(key)
+        if cached is not None:
+            cache.move_to_end(key)
+        return cached
+    
+    def _cache_llm_output(self, cache: OrderedDict, key: Tuple[bytes, str], output: str):
+        """Remember an LLM helper output, evicting the least recently used"""
+        cache[key] = output
+        if len(cache) > self._llm_cache_size:
+            cache.popitem(last=False)
     
     def _describe_expected_fix(self, action: RefinementAction, issues: List[str]) -> str:
         """Describe what the refinement should fix"""
         
-        descriptions = {
-            RefinementAction.CLARIFY_FORMAT: "Correct the output format to match specifications",
-            RefinementAction.REQUEST_MISSING_DATA: "Include all missing required fields and data",
-            RefinementAction.FIX_STRUCTURE: "Restructure the response to match expected format",
-            RefinementAction.PROVIDE_EXAMPLES: "Follow the provided example format exactly",
-            RefinementAction.SIMPLIFY_REQUEST: "Address the simplified, clearer request",
-            RefinementAction.SPLIT_REQUEST: "Address each part of the split request separately"
-        }
-        
-        base_description = descriptions.get(action, "Improve response quality")
+        base_description = _FIX_DESCRIPTIONS.get(action, "Improve response quality")
         if issues:
             return f"{base_description}. Specific issues: {', '.join(issues[:2])}"
         return base_description
@@ -751,81 +1475,87 @@ Simplified version:
         ]
         
         self.refinement_rules = default_rules
+        self._index_rules()
         
         # Store rules in database
+        now_iso = self._get_now_iso()
         for rule in default_rules:
-            self._store_refinement_rule(rule)
+            self._store_refinement_rule(rule, now_iso)
+    
+    def _index_rules(self):
+        """Index rules by (trigger, service) in descending priority, ties in list order"""
+        
+        index = {}
+        for order, rule in enumerate(self.refinement_rules):
+            index.setdefault((rule.trigger, rule.service_specific), []).append(
+                (-rule.priority, order, rule)
+            )
+        for entries in index.values():
+            entries.sort(key=lambda entry: entry[:2])
+        self._rules_index = index
     
     def get_refinement_statistics(self) -> Dict[str, Any]:
         """Get refinement loop statistics"""
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Overall stats
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_sessions,
-                SUM(CASE WHEN final_success = 1 THEN 1 ELSE 0 END) as successful_sessions,
-                AVG(total_attempts) as avg_attempts,
-                AVG(time_elapsed) as avg_time,
-                AVG(final_quality_score) as avg_final_quality
-            FROM refinement_sessions
-        ''')
-        overall_stats = dict(zip([
-            'total_sessions', 'successful_sessions', 'avg_attempts', 'avg_time', 'avg_final_quality'
-        ], cursor.fetchone()))
-        
-        # Service-specific stats
-        cursor.execute('''
-            SELECT 
-                service,
-                COUNT(*) as sessions,
-                AVG(total_attempts) as avg_attempts,
-                SUM(CASE WHEN final_success = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-            FROM refinement_sessions
-            GROUP BY service
-        ''')
-        service_stats = [
-            dict(zip(['service', 'sessions', 'avg_attempts', 'success_rate'], row))
-            for row in cursor.fetchall()
-        ]
-        
-        # Most common issues
-        cursor.execute('''
-            SELECT 
-                trigger_reason,
-                COUNT(*) as frequency
-            FROM refinement_attempts
-            GROUP BY trigger_reason
-            ORDER BY frequency DESC
-            LIMIT 5
-        ''')
-        common_issues = [
-            dict(zip(['issue', 'frequency'], row))
-            for row in cursor.fetchall()
-        ]
-        
-        conn.close()
+        # Make buffered and queued rows visible to the aggregates
+        self._flush_pending()
+        self._wait_for_writes()
+        return self._read_statistics()
+    
+    async def get_refinement_statistics_async(self) -> Dict[str, Any]:
+        """Get refinement loop statistics without blocking the event loop"""
+        self._flush_pending()
+        await self._write_barrier()
+        return await asyncio.to_thread(self._read_statistics)
+    
+    def _read_statistics(self) -> Dict[str, Any]:
+        """Run the statistics aggregates over the committed rows"""
+        with self._db_lock:
+            # Overall stats
+            overall_stats = dict(self._conn.execute(_OVERALL_STATS_SQL).fetchone())
+            
+            # Service-specific stats
+            service_stats = [dict(row) for row in self._conn.execute(_SERVICE_STATS_SQL)]
+            
+            # Per-attempt quality scores
+            attempt_quality = dict(self._conn.execute(_ATTEMPT_QUALITY_SQL).fetchone())
+            
+            # Most common issues
+            common_issues = [dict(row) for row in self._conn.execute(_COMMON_ISSUES_SQL)]
         
         return {
             "overall": overall_stats,
             "by_service": service_stats,
+            "attempt_quality": attempt_quality,
             "common_issues": common_issues,
             "success_rate": overall_stats['successful_sessions'] / overall_stats['total_sessions'] if overall_stats['total_sessions'] > 0 else 0
         }
     
+    def get_session_attempts(self, session_id: str) -> List[Dict[str, Any]]:
+        """Stored attempts of a session, with their packed prompt and response text"""
+        
+        self._flush_pending()
+        self._wait_for_writes()
+        
+        with self._db_lock:
+            attempts = [dict(row) for row in self._conn.execute(_SELECT_SESSION_ATTEMPTS_SQL, (session_id,))]
+            payloads = [row[0] for row in self._conn.execute(_SELECT_PACKED_ATTEMPTS_SQL, (session_id,))]
+            zdicts = dict(self._conn.execute(_SELECT_PACK_DICTS_SQL).fetchall()) if payloads else {}
+        
+        # Rows written before packing still carry their own text columns
+        texts = {}
+        for payload in payloads:
+            for fields in _unpack_attempts(payload, zdicts):
+                texts[fields["attempt_id"]] = fields
+        for attempt in attempts:
+            attempt.update(texts.get(attempt["attempt_id"], ()))
+        return attempts
+    
     # Database operations
-    def _store_refinement_session(self, session: RefinementSession):
-        """Store refinement session in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO refinement_sessions 
-            (session_id, original_prompt, target_output, service, final_success, 
-             total_attempts, time_elapsed, final_quality_score, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    def _finalize_session(self, session: RefinementSession, created_at: str) -> Tuple[Tuple[str, Any, bool], ...]:
+        """Statements writing the buffered rows and the finished session's row as one transaction"""
+        statements = self._take_pending_statements()
+        statements.append((_INSERT_SESSION_SQL, (
             session.session_id,
             session.original_prompt,
             session.target_output,
@@ -834,142 +1564,156 @@ Simplified version:
             session.total_attempts,
             session.time_elapsed,
             session.final_quality_score,
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-        conn.close()
-    
-    def _update_refinement_session(self, session: RefinementSession):
-        """Update refinement session with final results"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE refinement_sessions 
-            SET final_success = ?, total_attempts = ?, time_elapsed = ?, 
-                final_quality_score = ?, completed_at = ?
-            WHERE session_id = ?
-        ''', (
-            session.final_success,
-            session.total_attempts,
-            session.time_elapsed,
-            session.final_quality_score,
-            datetime.now().isoformat(),
-            session.session_id
-        ))
-        conn.commit()
-        conn.close()
+            created_at,
+            self._get_now_iso()
+        ), False))
+        return tuple(statements)
     
     def _store_refinement_attempt(self, attempt: RefinementAttempt, response: str, success: bool):
-        """Store refinement attempt in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO refinement_attempts 
-            (attempt_id, session_id, refinement_number, trigger_reason, refinement_prompt, 
-             expected_fix, service, response_received, attempt_success, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        """Buffer refinement attempt until the session's batch write"""
+        row = (
             attempt.attempt_id,
             attempt.original_request_id,
             attempt.refinement_number,
             attempt.trigger_reason.value,
-            attempt.refinement_prompt,
-            attempt.expected_fix,
             attempt.service.value,
-            response[:1000],  # Truncate response
             success,
-            attempt.timestamp
-        ))
-        conn.commit()
-        conn.close()
+            attempt.timestamp,
+            attempt.refinement_prompt,
+            attempt.expected_fix,
+            response  # Truncated to _RESPONSE_BYTES_LIMIT when packed
+        )
+        with self._db_lock:
+            self._pending_attempts.append(row)
+            flush = len(self._pending_attempts) >= _PENDING_FLUSH_ROWS
+        
+        # Bound the buffer when many concurrent sessions are still running
+        if flush:
+            self._flush_pending()
+    
+    def _load_rule_cache(self) -> Dict[str, Tuple[tuple, float]]:
+        """Map stored rule ids to their (definition, success_rate)"""
+        with self._db_lock:
+            rows = self._conn.execute(_SELECT_RULES_SQL).fetchall()
+        return {row[0]: (tuple(row[1:7]), row[7]) for row in rows}
     
-    def _store_refinement_rule(self, rule: RefinementRule):
-        """Store refinement rule in database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO refinement_rules 
-            (rule_id, trigger, condition_desc, action, priority, max_attempts, 
-             service_specific, success_rate, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            rule.rule_id,
+    def _store_refinement_rule(self, rule: RefinementRule, now_iso: Optional[str] = None):
+        """Queue refinement rule for the database writer, skipping unchanged rules"""
+        definition = (
             rule.trigger.value,
             rule.condition,
             rule.action.value,
             rule.priority,
             rule.max_attempts,
-            rule.service_specific.value if rule.service_specific else None,
-            rule.success_rate,
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-        conn.close()
+            rule.service_specific.value if rule.service_specific else None
+        )
+        cached = self._rule_cache.get(rule.rule_id)
+        self._rule_cache[rule.rule_id] = (definition, rule.success_rate)
+        if cached is not None and cached[0] == definition:
+            # Only the success rate can have moved; rewrite that column alone
+            if cached[1] != rule.success_rate:
+                self._enqueue_write(((_UPDATE_RULE_SUCCESS_SQL, (rule.success_rate, rule.rule_id), False),))
+            return
+        
+        if now_iso is None:
+            now_iso = self._get_now_iso()
+        self._enqueue_write(((_UPSERT_RULE_SQL, (rule.rule_id, *definition, rule.success_rate, now_iso), False),))
     
-    def _store_quality_metrics(self, session_id: str, attempt_number: int, quality_score: float):
-        """Store quality metrics for analysis"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO quality_metrics 
-            (metric_id, session_id, attempt_number, overall_quality, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            str(uuid.uuid4()),
+    def _store_quality_metrics(self, session_id: str, attempt_number: int, quality_score: float,
+                               metric_id: Optional[str] = None, now_iso: Optional[str] = None):
+        """Buffer quality metrics until the session's batch write"""
+        if metric_id is None:
+            metric_id = str(uuid.uuid4())
+        if now_iso is None:
+            now_iso = self._get_now_iso()
+        row = (
+            metric_id,
             session_id,
             attempt_number,
             quality_score,
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-        conn.close()
-    
-    def _update_success_patterns(self, session: RefinementSession):
-        """Update success patterns based on session results"""
-        # This would analyze successful refinement patterns for future use
-        pass
-
-
-def main():
-    """Test the refinement loop system"""
-    print("🔄 Testing Refinement Loop System")
-    print("=" * 50)
+            now_iso
+        )
+        with self._db_lock:
+            self._pending_metrics.append(row)
+            flush = len(self._pending_metrics) >= _PENDING_FLUSH_ROWS
+        
+        # Bound the buffer when many concurrent sessions are still running
+        if flush:
+            self._flush_pending()
     
-    # Initialize system
-    system = RefinementLoopSystem(session_id="test_refinement")
+    def _txn(self):
+        """Run the enclosed statements as one write transaction (caller holds _db_lock)"""
+        return _transaction(self._conn)
     
-    # Test refinement loop
-    print("\n🔄 Testing refinement loop...")
+    def _flush_pending(self):
+        """Hand all buffered attempt and metric rows to the writer as one transaction"""
+        statements = self._take_pending_statements()
+        if statements:
+            self._enqueue_write(tuple(statements))
     
-    async def test_loop():
-        session = await system.execute_refinement_loop(
-            "Extract company information from the text",
-            '{"companies": [{"name": "", "description": ""}], "count": 0}',
-            ServiceType.CLAUDE,
-            OutputFormat.JSON,
-            max_refinements=3,
-            quality_threshold=0.7
+    def _take_pending_statements(self) -> List[Tuple[str, Any, bool]]:
+        """Take the buffered rows and return the statements that insert them"""
+        return _pending_statements(
+            self._pending_attempts, self._pending_metrics, self._db_lock, self._get_now_iso()
         )
+    
+    def _enqueue_write(
+        self,
+        statements: Tuple[Tuple[str, Any, bool], ...],
+        on_done: Optional[Callable[[Optional[BaseException]], None]] = None
+    ):
+        """Queue (sql, params, executemany) statements for the writer thread"""
+        self._write_queue.put((statements, on_done))
+    
+    async def _write_and_wait(self, statements: Tuple[Tuple[str, Any, bool], ...]):
+        """Queue statements for the writer and wait for their commit, raising any write failure"""
+        # The writer is gone once closed: nothing would ever settle the future
+        if self._closed:
+            if any(rows for _, rows, _ in statements):
+                raise RuntimeError("RefinementLoopSystem is closed; cannot write refinement data")
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def on_done(error: Optional[BaseException]):
+            try:
+                loop.call_soon_threadsafe(_settle_future, future, error)
+            except RuntimeError:
+                pass  # Event loop already closed; nobody is waiting
         
-        print(f"✅ Refinement loop completed!")
-        print(f"   Success: {session.final_success}")
-        print(f"   Attempts: {session.total_attempts}")
-        print(f"   Final quality: {session.final_quality_score:.2f}")
-        print(f"   Time elapsed: {session.time_elapsed:.2f}s")
+        self._enqueue_write(statements, on_done)
+        await future
+        self._raise_write_error()
     
-    # Run async test
-    import asyncio
-    asyncio.run(test_loop())
+    async def _write_barrier(self):
+        """Wait until every write queued so far has been committed"""
+        await self._write_and_wait(())
     
-    # Test statistics
-    print("\n📊 Testing statistics...")
-    stats = system.get_refinement_statistics()
-    print(f"✅ Statistics retrieved:")
-    print(f"   Total sessions: {stats['overall']['total_sessions']}")
-    print(f"   Success rate: {stats['success_rate']:.2f}")
+    def _wait_for_writes(self):
+        """Block until the writes queued before this call are committed, without waiting on later ones"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._enqueue_write((), lambda error: done.set())
+        done.wait()
+        self._raise_write_error()
     
-    print(f"\n✅ RefinementLoopSystem test completed!")
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+    def _raise_write_error(self):
+        """Raise the failure of an earlier write job that had no waiter"""
+        try:
+            error = self._write_errors.popleft()
+        except IndexError:
+            return
+        raise error
+    
+    def close(self):
+        """Flush buffered rows, stop the writer and close the shared database connection"""
+        if self._closed:
+            return
+        self._closed = True
+        self._finalizer()
+    
+    def _update_success_patterns(self, session: RefinementSession):
+        """Update success patterns based on session results"""
+        # This would analyze successful refinement patterns for future use
+        pass
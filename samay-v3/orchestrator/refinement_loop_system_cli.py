@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Samay v3 - Refinement Loop System CLI
+=====================================
+Manual test harness for the refinement loop system
+"""
+
+import asyncio
+
+from .refinement_loop_system import RefinementLoopSystem
+from .web_agent_dispatcher import ServiceType, OutputFormat
+
+
+def main():
+    """Test the refinement loop system"""
+    print("🔄 Testing Refinement Loop System")
+    print("=" * 50)
+    
+    # Initialize system
+    system = RefinementLoopSystem(session_id="test_refinement")
+    
+    # Test refinement loop
+    print("\n🔄 Testing refinement loop...")
+    
+    async def test_loop():
+        session = await system.execute_refinement_loop(
+            "Extract company information from the text",
+            '{"companies": [{"name": "", "description": ""}], "count": 0}',
+            ServiceType.CLAUDE,
+            OutputFormat.JSON,
+            max_refinements=3,
+            quality_threshold=0.7
+        )
+        
+        print(f"✅ Refinement loop completed!")
+        print(f"   Success: {session.final_success}")
+        print(f"   Attempts: {session.total_attempts}")
+        print(f"   Final quality: {session.final_quality_score:.2f}")
+        print(f"   Time elapsed: {session.time_elapsed:.2f}s")
+    
+    # Run async test
+    asyncio.run(test_loop())
+    
+    # Test statistics
+    print("\n📊 Testing statistics...")
+    stats = system.get_refinement_statistics()
+    print(f"✅ Statistics retrieved:")
+    print(f"   Total sessions: {stats['overall']['total_sessions']}")
+    print(f"   Success rate: {stats['success_rate']:.2f}")
+    
+    print(f"\n✅ RefinementLoopSystem test completed!")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -7,12 +7,20 @@ Based on Comprehensive Implementation Plan
 """
 
 import os
+import random
+import re
 import time
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Login polling backs off from the caller's initial interval up to this cap, with jitter
+_LOGIN_POLL_BACKOFF = 1.5
+_LOGIN_POLL_MAX_INTERVAL = 5.0
+_LOGIN_POLL_JITTER = 0.2
+
 
 class SessionValidator:
     """Validates and maintains authentication sessions"""
@@ -53,6 +61,11 @@ class SessionValidator:
                 "timeout": 8
             }
         }
+        
+        # One CSS group selector and one regex per service, so each check is a single query
+        for config in self.service_configs.values():
+            config["auth_selector_group"] = ", ".join(config["auth_selectors"])
+            config["login_indicator_re"] = re.compile("|".join(map(re.escape, config["login_indicators"])))
     
     def is_logged_in(self, driver, service: str) -> bool:
         """
@@ -79,52 +92,22 @@ class SessionValidator:
             print(f"📍 Current URL: {current_url}")
             
             # Strategy 1: Check for login redirect
-            for login_indicator in config["login_indicators"]:
-                if login_indicator in current_url:
-                    print(f"❌ Detected login redirect: {login_indicator}")
-                    return False
+            login_match = config["login_indicator_re"].search(current_url)
+            if login_match:
+                print(f"❌ Detected login redirect: {login_match.group()}")
+                return False
             
             # Strategy 3: Service-specific checks (moved up for faster detection)
-            if service == "claude":
-                # Check for authenticated URLs first (most reliable)
-                if any(path in current_url for path in ["/new", "/chats", "/chat"]):
-                    print("✅ Claude authenticated (authenticated URL)")
-                    return True
-                
-                # Claude shows user avatar when logged in
-                page_title = driver.get_title().lower()
-                if "claude" in page_title and "login" not in page_title:
-                    print("✅ Claude authenticated (title check)")
-                    return True
-            
-            elif service == "gemini":
-                # Gemini redirects to accounts.google.com when not logged in
-                if "accounts.google.com" not in current_url:
-                    print("✅ Gemini authenticated (no Google redirect)")
-                    return True
-                    
-            elif service == "perplexity":
-                # Check for authenticated URLs first
-                if current_url == "https://www.perplexity.ai/" and "signin" not in current_url:
-                    print("✅ Perplexity authenticated (main page, no signin)")
-                    return True
-                
-                # Perplexity shows different content when logged in
-                try:
-                    driver.wait_for_element_visible("nav", timeout=5)
-                    print("✅ Perplexity authenticated (nav visible)")
-                    return True
-                except:
-                    pass
+            signal = self._service_auth_signal(driver, service, current_url, nav_timeout=5)
+            if signal is not None:
+                print(f"✅ {service.capitalize()} authenticated ({signal})")
+                return True
             
             # Strategy 2: Look for authenticated user elements (fallback)
-            for selector in config["auth_selectors"]:
-                try:
-                    driver.wait_for_element_visible(selector, timeout=config["timeout"])
-                    print(f"✅ Found auth element: {selector}")
-                    return True
-                except (TimeoutException, NoSuchElementException):
-                    continue
+            element = self._wait_for_auth_element(driver, config, config["timeout"])
+            if element is not None:
+                print(f"✅ Found auth element: {self._matched_selector(driver, config, element)}")
+                return True
             
             print(f"❌ No authentication indicators found for {service}")
             return False
@@ -133,26 +116,129 @@ class SessionValidator:
             print(f"❌ Session validation error for {service}: {e}")
             return False
     
-    def wait_for_login(self, driver, service: str, max_attempts: int = 30) -> bool:
+    def _service_auth_signal(self, driver, service: str, current_url: str, nav_timeout: float):
+        """
+        Service-specific sign of a logged-in page, checked without navigating
+        
+        Returns a short description of the signal found, or None
+        """
+        if service == "claude":
+            # Check for authenticated URLs first (most reliable)
+            if any(path in current_url for path in ["/new", "/chats", "/chat"]):
+                return "authenticated URL"
+            
+            # Claude shows user avatar when logged in
+            page_title = driver.get_title().lower()
+            if "claude" in page_title and "login" not in page_title:
+                return "title check"
+        
+        elif service == "gemini":
+            # Gemini redirects to accounts.google.com when not logged in
+            if "accounts.google.com" not in current_url:
+                return "no Google redirect"
+        
+        elif service == "perplexity":
+            # Check for authenticated URLs first
+            if current_url == "https://www.perplexity.ai/" and "signin" not in current_url:
+                return "main page, no signin"
+            
+            # Perplexity shows different content when logged in
+            if self._wait_for_visible(driver, "nav", nav_timeout) is not None:
+                return "nav visible"
+        
+        return None
+    
+    def _wait_for_auth_element(self, driver, config: dict, timeout: float):
+        """
+        Wait until any auth selector matches a visible element
+        
+        Queries all selectors at once through the combined group selector,
+        so a negative check costs one timeout instead of one per selector
+        """
+        return self._wait_for_visible(driver, config["auth_selector_group"], timeout)
+    
+    def _wait_for_visible(self, driver, css_selector: str, timeout: float):
+        """Poll until a CSS selector matches a visible element; a zero timeout checks once"""
+        deadline = time.monotonic() + timeout
+        while True:
+            for element in driver.find_elements(By.CSS_SELECTOR, css_selector):
+                try:
+                    if element.is_displayed():
+                        return element
+                except StaleElementReferenceException:
+                    continue
+            
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.2)
+    
+    def _matched_selector(self, driver, config: dict, element) -> str:
+        """Name the auth selector an element matched, for logging"""
+        try:
+            return driver.execute_script(
+                "return arguments[1].find(s => arguments[0].matches(s)) || arguments[1].join(', ');",
+                element, config["auth_selectors"]
+            )
+        except Exception:
+            return config["auth_selector_group"]
+    
+    def wait_for_login(self, driver, service: str, timeout_s: float = 150,
+                       initial_interval_s: float = 0.5) -> bool:
         """
         Wait for user to complete manual login
         
-        Polls every 5 seconds to check if login is complete
+        Runs the full is_logged_in check first and last; in between polls the
+        open page with a fast check, backing off from initial_interval_s to 5s
         """
         print(f"⏳ Waiting for {service} login completion...")
         
-        for attempt in range(max_attempts):
-            if self.is_logged_in(driver, service):
+        if self.is_logged_in(driver, service):
+            print(f"✅ {service} login detected!")
+            return True
+        
+        deadline = time.monotonic() + timeout_s
+        interval = initial_interval_s
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            if interval >= _LOGIN_POLL_MAX_INTERVAL:
+                print(f"⏳ {remaining:.0f}s left - checking again in {interval:.0f}s...")
+            jitter = random.uniform(1 - _LOGIN_POLL_JITTER, 1 + _LOGIN_POLL_JITTER)
+            time.sleep(min(interval * jitter, remaining))
+            interval = min(interval * _LOGIN_POLL_BACKOFF, _LOGIN_POLL_MAX_INTERVAL)
+            
+            if time.monotonic() < deadline and self._is_logged_in_fast(driver, service):
                 print(f"✅ {service} login detected!")
                 return True
-            
-            if attempt < max_attempts - 1:
-                print(f"⏳ Attempt {attempt + 1}/{max_attempts} - checking again in 5s...")
-                time.sleep(5)
         
-        print(f"❌ Login timeout for {service} after {max_attempts * 5} seconds")
+        if self.is_logged_in(driver, service):
+            print(f"✅ {service} login detected!")
+            return True
+        
+        print(f"❌ Login timeout for {service} after {timeout_s:.0f} seconds")
         return False
     
+    def _is_logged_in_fast(self, driver, service: str) -> bool:
+        """
+        Check the page already open in the driver for a completed login
+        
+        Skips navigation and page-load waits: the same URL, service-specific
+        and combined auth selector checks as is_logged_in, without waiting
+        """
+        config = self.service_configs[service]
+        
+        try:
+            current_url = driver.get_current_url().lower()
+            if config["login_indicator_re"].search(current_url):
+                return False
+            if self._service_auth_signal(driver, service, current_url, nav_timeout=0) is not None:
+                return True
+            return self._wait_for_auth_element(driver, config, 0) is not None
+        except Exception:
+            return False
+    
     def perform_login_flow(self, driver, service: str) -> bool:
         """
         Handle the login flow for a service
@@ -193,7 +279,7 @@ class SessionValidator:
             print(f"📍 Current URL: {driver.get_current_url()}")
             
             # Wait for user to complete login
-            return self.wait_for_login(driver, "claude", max_attempts=36)  # 3 minutes
+            return self.wait_for_login(driver, "claude", timeout_s=180)  # 3 minutes
             
         except Exception as e:
             print(f"❌ Claude login flow failed: {e}")
@@ -213,7 +299,7 @@ class SessionValidator:
             
             print(f"\n🌐 Opened Gemini page")
             
-            return self.wait_for_login(driver, "gemini", max_attempts=36)
+            return self.wait_for_login(driver, "gemini", timeout_s=180)
             
         except Exception as e:
             print(f"❌ Gemini login flow failed: {e}")
@@ -233,7 +319,7 @@ class SessionValidator:
             
             print(f"\n🌐 Opened Perplexity page")
             
-            return self.wait_for_login(driver, "perplexity", max_attempts=36)
+            return self.wait_for_login(driver, "perplexity", timeout_s=180)
             
         except Exception as e:
             print(f"❌ Perplexity login flow failed: {e}")
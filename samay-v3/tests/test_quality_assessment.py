@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Samay v3 - Quality Assessment Tests
+===================================
+
+Unit tests for the SQLite-backed QualityAssessor:
+- Deferred writes commit assessments and cache rows in one transaction
+- Stored benchmarks with a zero threshold
+"""
+
+import sys
+from pathlib import Path
+
+# Add paths for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from orchestrator.quality_assessment import AssessmentMethod, QualityAssessor
+
+
+def _count_commits(assessor: QualityAssessor, action) -> int:
+    """Run action and count the COMMIT statements it sends to the assessor's connection"""
+    statements = []
+    assessor._conn.set_trace_callback(statements.append)
+    try:
+        action()
+    finally:
+        assessor._conn.set_trace_callback(None)
+    return sum(statement.lstrip().upper().startswith("COMMIT") for statement in statements)
+
+
+def test_deferred_assessments_commit_once(tmp_path):
+    """Assessments and their assessment_cache rows share one commit, deferred or not."""
+    assessor = QualityAssessor(memory_dir=str(tmp_path))
+
+    def assess_batch():
+        with assessor.deferred_writes():
+            for index in range(5):
+                assessor.assess_prompt_quality(
+                    f"Write item {index} about cats.", f"v{index}", AssessmentMethod.HEURISTIC
+                )
+
+    assert _count_commits(assessor, assess_batch) == 1
+    assert _count_commits(assessor, lambda: assessor.assess_prompt_quality(
+        "Describe the ocean.", "single", AssessmentMethod.HEURISTIC
+    )) == 1
+
+    with assessor._db_lock:
+        cached = assessor._conn.execute("SELECT COUNT(*) FROM assessment_cache").fetchone()[0]
+    assessor.close()
+    assert cached == 6
+
+
+def test_zero_benchmark_threshold(tmp_path):
+    """A stored benchmark with a zero threshold loads and is always fully met."""
+    assessor = QualityAssessor(memory_dir=str(tmp_path))
+    with assessor._db_lock:
+        with assessor._conn:
+            assessor._conn.execute(
+                "INSERT INTO quality_benchmarks (benchmark_id, benchmark_name, score_threshold) VALUES (?, ?, ?)",
+                ("bench_any", "any_output", 0.0)
+            )
+    assessor.close()
+
+    reloaded = QualityAssessor(memory_dir=str(tmp_path))
+    assessment = reloaded.assess_prompt_quality("Describe the ocean.", "v1", AssessmentMethod.HEURISTIC)
+    reloaded.close()
+    assert assessment.benchmark_comparison == {"any_output": 1.0}
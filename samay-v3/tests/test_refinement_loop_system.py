@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Samay v3 - Refinement Loop System Tests
+=======================================
+
+Unit tests for the RefinementLoopSystem database lifecycle:
+- Unclosed systems are collected and stop their writer thread
+- Awaited writes on a closed system fail fast instead of hanging
+"""
+
+import asyncio
+import gc
+import sqlite3
+import sys
+import weakref
+from pathlib import Path
+
+# Add paths for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from orchestrator import refinement_loop_system
+from orchestrator.refinement_loop_system import RefinementLoopSystem
+from orchestrator.web_agent_dispatcher import OutputFormat, ServiceType
+
+
+def test_unclosed_system_is_collected(tmp_path):
+    """Dropping the last reference flushes buffered rows and stops the writer thread."""
+    system = RefinementLoopSystem(memory_dir=str(tmp_path))
+    system._store_quality_metrics("dropped", 1, 0.5)
+    writer = system._writer
+    finalizer = system._finalizer
+
+    system_ref = weakref.ref(system)
+    del system
+    gc.collect()
+
+    assert system_ref() is None
+    assert not finalizer.alive
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+
+    reopened = RefinementLoopSystem(memory_dir=str(tmp_path))
+    with reopened._db_lock:
+        rows = reopened._conn.execute(
+            "SELECT COUNT(*) FROM quality_metrics WHERE session_id = 'dropped'"
+        ).fetchone()[0]
+    reopened.close()
+    assert rows == 1
+
+
+def test_closed_system_does_not_hang(tmp_path, monkeypatch):
+    """Barriers return at once and session writes raise after close()."""
+    real_sleep = asyncio.sleep
+
+    async def no_wait(delay, *args, **kwargs):
+        await real_sleep(0)
+
+    monkeypatch.setattr(refinement_loop_system.asyncio, "sleep", no_wait)
+
+    system = RefinementLoopSystem(memory_dir=str(tmp_path), min_request_interval=0)
+    system.close()
+
+    async def run():
+        await asyncio.wait_for(system._write_barrier(), timeout=5)
+        with pytest.raises(sqlite3.ProgrammingError):
+            await asyncio.wait_for(system.get_refinement_statistics_async(), timeout=5)
+        with pytest.raises(RuntimeError, match="closed"):
+            await asyncio.wait_for(system.execute_refinement_loop(
+                "Summarize", '{"a": 1}', ServiceType.CLAUDE, OutputFormat.JSON, max_refinements=1
+            ), timeout=5)
+
+    asyncio.run(run())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Samay v3 - Task Scheduler Tests
+===============================
+
+Unit tests for the SQLite-backed TaskScheduler:
+- JSON column encoding with and without orjson
+- Task ID uniqueness across scheduler instances
+"""
+
+import importlib
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+# Add paths for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _load_task_scheduler(monkeypatch, orjson_module=None):
+    """Import orchestrator.task_scheduler fresh, with orjson stubbed in or hidden"""
+    monkeypatch.setitem(sys.modules, "orjson", orjson_module)
+    monkeypatch.delitem(sys.modules, "orchestrator.task_scheduler", raising=False)
+    return importlib.import_module("orchestrator.task_scheduler")
+
+
+def _fake_orjson():
+    """Minimal orjson stand-in: bytes out of dumps, like the real module"""
+    module = types.ModuleType("orjson")
+    module.dumps = lambda value: json.dumps(value, separators=(",", ":")).encode()
+    module.loads = json.loads
+    return module
+
+
+@pytest.mark.parametrize("orjson_module", [None, _fake_orjson()], ids=["json", "orjson"])
+def test_json_columns_round_trip(tmp_path, monkeypatch, orjson_module):
+    """Tags, notes and history details survive a reload with either JSON backend."""
+    task_scheduler = _load_task_scheduler(monkeypatch, orjson_module)
+    assert getattr(task_scheduler, "orjson", None) is orjson_module
+
+    scheduler = task_scheduler.TaskScheduler(str(tmp_path), user_id="alice")
+    task_id = scheduler.create_task("Write report", tags=["work", "q2"])
+    scheduler.create_tasks([{"title": "Review", "tags": ["work"]}])
+    scheduler.update_task_status(task_id, task_scheduler.TaskStatus.IN_PROGRESS, "started")
+    assert scheduler.get_task_statistics()["total_tasks"] == 2
+    scheduler.close()
+
+    reloaded = task_scheduler.TaskScheduler(str(tmp_path), user_id="alice")
+    task = reloaded.active_tasks[task_id]
+    assert task.tags == ["work", "q2"]
+    assert len(task.notes) == 1 and task.notes[0].endswith(": started")
+    with reloaded._connection() as conn:
+        details = conn.execute(
+            "SELECT details FROM task_history WHERE task_id = ? AND action = 'status_updated'", (task_id,)
+        ).fetchone()[0]
+    assert details == '{"from":"pending","to":"in_progress","notes":"started"}'
+    reloaded.close()
+
+
+def test_ids_unique_across_schedulers(tmp_path, monkeypatch):
+    """Two schedulers creating tasks in the same millisecond never overwrite each other."""
+    task_scheduler = _load_task_scheduler(monkeypatch)
+    monkeypatch.setattr(task_scheduler.time, "time_ns", lambda: 1_700_000_000_000_000_000)
+
+    first = task_scheduler.TaskScheduler(str(tmp_path), user_id="alice")
+    second = task_scheduler.TaskScheduler(str(tmp_path), user_id="bob")
+    first_id = first.create_task("From alice")
+    second_id = second.create_task("From bob")
+    assert first_id != second_id
+    first.close()
+    second.close()
+
+    reloaded = task_scheduler.TaskScheduler(str(tmp_path), user_id="alice")
+    with reloaded._connection() as conn:
+        rows = dict(conn.execute("SELECT id, user_id FROM tasks").fetchall())
+    assert rows == {first_id: "alice", second_id: "bob"}
+    reloaded.close()